@@ -1,10 +1,81 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Post, Follower, Feedback
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .models import User, Post, Follower, Feedback, TimelineEntry, Recommendation
+
+
+class EstimatedCountPaginator(Paginator):
+    """ A paginator for changelists of tables too large to COUNT(*).
+        The whole table is estimated from its largest primary key, which is read from the end of its index, so
+        rows that have been deleted are counted and the last pages may be empty. A filtered or searched list is
+        counted up to NETWORK_ADMIN_COUNT_LIMIT rows, and pages beyond that cannot be reached.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.model._base_manager.using(queryset.db).aggregate(last=Max('pk'))['last'] or 0
+        return queryset.order_by()[:getattr(settings, 'NETWORK_ADMIN_COUNT_LIMIT', 10000)].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Related objects are picked by ID rather than from a dropdown of every user or post,
+    # and searches look up exact usernames, which are indexed, rather than scanning for substrings.
+    paginator = EstimatedCountPaginator
+    # Don't count the whole table again to show 'N of M selected' after a search.
+    show_full_result_count = False
+
+
+@admin.register(Post)
+class PostAdmin(LargeTableAdmin):
+    list_display = ('id', 'author', 'excerpt', 'like_count', 'created')
+    list_select_related = ('author',)
+    raw_id_fields = ('author',)
+    search_fields = ('author__username__exact',)
+
+    def get_queryset(self, request):
+        # The list shows the excerpt, and the change form loads the text when it needs it.
+        return super().get_queryset(request).defer('text')
+
+
+@admin.register(Follower)
+class FollowerAdmin(LargeTableAdmin):
+    list_display = ('id', 'follower', 'following')
+    list_select_related = ('follower', 'following')
+    raw_id_fields = ('follower', 'following')
+    search_fields = ('follower__username__exact', 'following__username__exact')
+
+
+@admin.register(Feedback)
+class FeedbackAdmin(LargeTableAdmin):
+    list_display = ('id', 'reader', 'post', 'opinion')
+    list_select_related = ('reader', 'post__author')
+    raw_id_fields = ('reader', 'post')
+    search_fields = ('reader__username__exact',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('post__text')
+
+
+@admin.register(TimelineEntry)
+class TimelineEntryAdmin(LargeTableAdmin):
+    list_display = ('id', 'owner', 'post_id', 'created')
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner', 'post')
+    search_fields = ('owner__username__exact',)
+
+
+@admin.register(Recommendation)
+class RecommendationAdmin(LargeTableAdmin):
+    list_display = ('id', 'owner', 'candidate', 'score')
+    list_select_related = ('owner', 'candidate')
+    raw_id_fields = ('owner', 'candidate')
+    search_fields = ('owner__username__exact',)
 
-# Register your models here.
 
 admin.site.register(User, UserAdmin)
-admin.site.register(Post)
-admin.site.register(Follower)
-admin.site.register(Feedback)
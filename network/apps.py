@@ -1,5 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class NetworkConfig(AppConfig):
     name = 'network'
+
+    def ready(self):
+        from .signals import (
+            apply_sqlite_pragmas, cache_logged_in_user, forget_cached_user, forget_logged_out_user,
+            install_query_recorder, install_search_triggers,
+        )
+        connection_created.connect(install_query_recorder, dispatch_uid='network_query_recorder')
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='network_sqlite_pragmas')
+        post_migrate.connect(install_search_triggers, sender=self, dispatch_uid='network_search_triggers')
+        User = self.get_model('User')
+        post_save.connect(forget_cached_user, sender=User, dispatch_uid='network_forget_saved_user')
+        post_delete.connect(forget_cached_user, sender=User, dispatch_uid='network_forget_deleted_user')
+        user_logged_in.connect(cache_logged_in_user, dispatch_uid='network_cache_logged_in_user')
+        user_logged_out.connect(forget_logged_out_user, dispatch_uid='network_forget_logged_out_user')
+        if getattr(settings, 'NETWORK_PERF_SAMPLE_RATE', 1.0) > 0:
+            from .middleware import time_template_renders
+            time_template_renders()
@@ -0,0 +1,102 @@
+""" Async versions of the timeline and like views, served in place of those in views.py under ASGI
+    (see NETWORK_ASYNC_VIEWS). They return the same responses, but hand their database work to the bounded
+    pool in network.pool, running independent queries concurrently instead of holding a thread for the request.
+"""
+import asyncio
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse
+from django.shortcuts import render
+
+from .models import User
+from .pool import run_sync
+from .recommendations import who_to_follow
+from .throttle import rate_limited
+from .views import _create_post, _following_page, _get_follow_option, _like_post, _live_feed, _posts_page
+
+
+def login_required(view):
+    # Django's login_required is synchronous, and checking the user loads it from the database.
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await run_sync(_is_authenticated, request):
+            return redirect_to_login(request.get_full_path(), '/login')
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@login_required
+@rate_limited('post')
+async def get_posts(request):
+    """ Returns a list of Posts, either 'all posts' or the posts relating to a supplied userid (uid)
+        Also detects if an author submits a new Post, and if so, processes that.
+        The author, the follow option, the suggestions and the page of posts are loaded concurrently.
+    """
+    if request.method == 'POST':
+        await run_sync(_create_post, request.user, request.POST.get('text', ''))
+
+    person = None
+    follow_option = None
+    suggestions = None
+
+    user_id = request.GET.get('uid', '')
+    if user_id:
+        # The like states of the page depend on which posts are on it, so are loaded along with the page.
+        # The follower and following counts are kept on the author's User record.
+        # The user's own profile needs neither the author nor the follow option loading.
+        own = user_id == str(request.user.id)
+        loads = [
+            run_sync(_posts_page, request, user_id),
+            run_sync(list, who_to_follow(request.user)),
+        ]
+        if not own:
+            loads += [run_sync(User.objects.get, id=user_id), run_sync(_get_follow_option, user_id, request.user)]
+        post_list, suggestions, *others = await asyncio.gather(*loads)
+        person, follow_option = others if others else (request.user, None)
+    else:
+        post_list = await run_sync(_posts_page, request, user_id)
+
+    content = {
+        'person': person,
+        'post_list': post_list,
+        'followers': person.follower_count if person else None,
+        'following': person.following_count if person else None,
+        'follow_option': follow_option,
+        'suggestions': suggestions,
+        'live': _live_feed(user_id or 'all'),
+    }
+    return await run_sync(render, request, "network/index.html", content)
+
+
+@login_required
+async def get_following(request):
+    """ Returns the posts for all of the authors that the user is following.
+        The user's follower and following counts are already loaded, so the page is the only query.
+    """
+    post_list = await run_sync(_following_page, request)
+
+    content = {
+        'post_list': post_list,
+        'followers': request.user.follower_count,
+        'following': request.user.following_count,
+        'live': _live_feed('following'),
+    }
+    return await run_sync(render, request, "network/index.html", content)
+
+
+@login_required
+@rate_limited('like')
+async def like(request):
+    """ Toggles the user's Like of a post, as views.like does.
+        The toggle and the like count update are a single transaction, run as one piece of work on the pool.
+    """
+    if request.method != 'POST':
+        # Method is not POST, therefore is not an Authorized method.
+        return HttpResponse(status=403)
+    return await run_sync(_like_post, request.user, request.GET.get('id', ''))
+
+
+def _is_authenticated(request):
+    # Loads the user from the session, after which request.user can be used without further queries.
+    return request.user.is_authenticated
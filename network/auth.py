@@ -0,0 +1,34 @@
+""" Identity without queries: the users that sessions are logged in as are kept in the default cache,
+    alongside the sessions themselves (the cached_db session engine), so an authenticated request that hits
+    both caches reads neither django_session nor network_user.
+    A cached user is forgotten whenever its row changes: on save and delete (see network/signals.py), on logout,
+    and where a counter is updated in place, e.g. by the follow view. It is cached again on login, or on the
+    next request that needs it. The cache must be shared between server processes for this to hold across them.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+class CachedModelBackend(ModelBackend):
+    # Django's ModelBackend, reading the logged in user from the cache before the database.
+
+    def get_user(self, user_id):
+        user = cache.get(user_cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                remember_user(user)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+def user_cache_key(user_id):
+    return f'network:user:{user_id}'
+
+
+def remember_user(user):
+    cache.set(user_cache_key(user.pk), user, getattr(settings, 'NETWORK_USER_CACHE_TIMEOUT', 300))
+
+
+def forget_users(*user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
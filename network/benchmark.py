@@ -0,0 +1,93 @@
+""" Helpers for the view benchmark and regression tests in tests.py.
+    A synthetic social graph is seeded into the test database, then each view is exercised through
+    the test client, recording its query count, p50/p99 latency and peak memory.
+    The results are checked against the budgets in benchmark_baseline.json.
+"""
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from .models import User
+from .seeding import generate_records, load_records
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+
+def graph_size():
+    # The size of the synthetic graph, which can be raised through the environment for larger runs.
+    return {
+        'users': int(os.environ.get('NETWORK_BENCH_USERS', 50)),
+        'posts_per_user': int(os.environ.get('NETWORK_BENCH_POSTS', 20)),
+        'follows_per_user': int(os.environ.get('NETWORK_BENCH_FOLLOWS', 10)),
+        'likes_per_user': int(os.environ.get('NETWORK_BENCH_LIKES', 20)),
+    }
+
+
+def seed_social_graph(users, posts_per_user, follows_per_user, likes_per_user, seed=50):
+    """ Bulk loads a random social graph, with every counter consistent, and returns the new users.
+        Every user's password is 'password'.
+    """
+    first_user = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    load_records(generate_records(users, posts_per_user, follows_per_user, likes_per_user, seed), batch_size=1000)
+    return list(User.objects.filter(id__gte=first_user).order_by('id'))
+
+
+def measure(request, runs):
+    """ Calls request() once to warm up, then the given number of times each to time it and to trace its memory,
+        and returns the worst query count, the p50 and p99 latency in milliseconds and the median of the requests'
+        peak memory allocated in KiB. Tracing slows every allocation, so requests are not timed while it is on,
+        and queries are counted only while timing, as recording them allocates too. The warm-up's one-off
+        allocations, such as loading the middleware, are left out of the peak, but its queries are counted,
+        so views that cache what they read are still held to the cost of a cold request. The median peak is
+        taken, as the odd request also pays for growing one of the interpreter's own tables.
+        As timeit does, garbage left by earlier code is collected first, and the collector is off while measuring,
+        so that neither pass measures the clean up of someone else's objects.
+    """
+    queries = 0
+    timings = []
+    peaks = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(runs + 1):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = max(queries, len(captured.captured_queries))
+        for _ in range(runs):
+            tracemalloc.start()
+            request()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    finally:
+        gc.enable()
+    # The first request was the warm-up.
+    timings = sorted(timings[1:])
+    peaks.sort()
+    return {
+        'queries': queries,
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        'peak_kib': round(peaks[len(peaks) // 2] / 1024, 1),
+    }
+
+
+def load_baseline():
+    with open(BASELINE_PATH) as baseline:
+        return json.load(baseline)
+
+
+def over_budget(result, budget):
+    # Returns a description of each measurement that exceeds its budget.
+    return [
+        f'{measurement} {result[measurement]} > {limit}'
+        for measurement, limit in budget.items()
+        if result[measurement] > limit
+    ]
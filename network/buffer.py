@@ -0,0 +1,141 @@
+""" An optional write-behind buffer for Post like counts.
+    Popular posts make every like contend on the same Post row, and SQLite serializes every writer.
+    With NETWORK_LIKE_BUFFER enabled, the like view records its Feedback straight away
+    but only adds the like_count change to this buffer, which is written to the database in batches.
+
+    Feedback records remain the durable source of truth. A flush only forgets its deltas once
+    the batch has committed, so a failed flush is retried on the next one. Deltas still buffered when
+    the process dies are lost from like_count, and `manage.py recount_likes` rebuilds the counts from Feedback.
+"""
+import atexit
+import math
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from .models import Post
+from .trending import combine_weights, like_weight, net_score_update
+
+
+class LikeCounterBuffer:
+
+    def __init__(self):
+        self._pending = {}
+        # The weights the buffered likes add and remove from each post's trending score, see combine_weights.
+        self._weights = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'NETWORK_LIKE_BUFFER', False)
+
+    def add(self, post_id, delta, moment):
+        # Records a like_count change of delta likes made at the moment, flushing once enough posts are waiting.
+        weight = like_weight(moment) + math.log2(abs(delta))
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            added, removed = self._weights.get(post_id, (None, None))
+            if delta > 0:
+                added = combine_weights(added, weight)
+            else:
+                removed = combine_weights(removed, weight)
+            self._weights[post_id] = (added, removed)
+            waiting = len(self._pending)
+        if waiting >= getattr(settings, 'NETWORK_LIKE_BUFFER_SIZE', 100):
+            self.flush()
+        else:
+            self._start_timer()
+
+    def pending(self, post_id):
+        # Returns the change to the post's like_count that has not been written yet.
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def like_count(self, post_id):
+        # Returns the post's like_count with the changes that have not been written yet.
+        # Both are read under the lock, which a flush holds while it commits and takes its batch out of the buffer.
+        with self._lock:
+            written = Post.objects.filter(id=post_id).values_list('like_count', flat=True).first() or 0
+            return written + self._pending.get(post_id, 0)
+
+    def merge(self, posts):
+        # Adds any buffered changes to the like_count of each post, so readers see up to date counts.
+        with self._lock:
+            if not self._pending:
+                return
+            for post in posts:
+                post.like_count += self._pending.get(post.id, 0)
+
+    def flush(self):
+        """ Writes the buffered changes to the database in a single transaction.
+            Returns the number of posts updated.
+        """
+        with self._flush_lock:
+            with self._lock:
+                # A like and its unlike cancel in the count but not always in the score, as the like may be older.
+                batch = {post_id: delta for post_id, delta in self._pending.items() if delta or post_id in self._weights}
+                weights, self._weights = self._weights, {}
+            if not batch:
+                return 0
+            locked = False
+            try:
+                with transaction.atomic():
+                    for post_id, delta in batch.items():
+                        added, removed = weights.get(post_id, (None, None))
+                        Post.objects.filter(id=post_id).update(
+                            like_count=F('like_count') + delta, trending_score=net_score_update(added, removed, delta),
+                        )
+                    # Hold the lock over the commit, so like_count never sees the batch in both places or neither.
+                    self._lock.acquire()
+                    locked = True
+            except DatabaseError:
+                # Nothing was written, so keep the changes for the next flush.
+                if not locked:
+                    self._lock.acquire()
+                try:
+                    for post_id, (added, removed) in weights.items():
+                        later_added, later_removed = self._weights.get(post_id, (None, None))
+                        self._weights[post_id] = (combine_weights(added, later_added), combine_weights(removed, later_removed))
+                finally:
+                    self._lock.release()
+                return 0
+            # Only now that the batch has committed, take its changes out of the buffer.
+            try:
+                for post_id, delta in batch.items():
+                    remaining = self._pending.get(post_id, 0) - delta
+                    if remaining:
+                        self._pending[post_id] = remaining
+                    else:
+                        self._pending.pop(post_id, None)
+            finally:
+                self._lock.release()
+            return len(batch)
+
+    def _start_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(getattr(settings, 'NETWORK_LIKE_BUFFER_INTERVAL', 1.0), self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own database connection, which would otherwise be left open.
+            connection.close()
+        with self._lock:
+            left_over = bool(self._pending)
+        if left_over:
+            self._start_timer()
+
+
+like_buffer = LikeCounterBuffer()
+atexit.register(like_buffer.flush)
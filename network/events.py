@@ -0,0 +1,186 @@
+""" Live updates for open pages, pushed as Server-Sent Events from GET /events.
+    The like, update and new post paths publish to an in-process hub, which passes each event to the streams
+    that are watching it: likes and edits to the streams showing that post, and new posts to the streams
+    showing a feed that they belong to, which count them for an 'N new posts' notice.
+    Streams are served by project4/asgi.py, outside the Django views, as Django 3.1 cannot stream a response
+    asynchronously. An idle stream is a coroutine waiting on its queue, so thousands cost little.
+    The hub only reaches streams in the same process.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user
+
+from .models import Follower
+from .pool import run_sync
+
+# The most posts a stream will watch, and the most events it will hold for a slow client before dropping them.
+MAX_POSTS = 100
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    # One open stream: the topics it watches, and a queue on its event loop that the hub delivers events to.
+
+    def __init__(self, topics):
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Called from whichever thread published the event.
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+
+class EventHub:
+    """ Passes published events to the subscriptions watching any of their topics.
+        Topics are ('post', id) for likes and edits, and ('all',) or ('author', id) for new posts.
+        Subscriptions are indexed by topic, so publishing costs the number of interested streams, not all of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = defaultdict(set)
+
+    def subscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics[topic].add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                watchers = self._topics.get(topic)
+                if watchers is not None:
+                    watchers.discard(subscription)
+                    if not watchers:
+                        del self._topics[topic]
+
+    def publish(self, topics, kind, data):
+        with self._lock:
+            subscriptions = set().union(*(self._topics.get(topic, ()) for topic in topics))
+        for subscription in subscriptions:
+            subscription.deliver((kind, data))
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._topics.values()))
+
+
+hub = EventHub()
+
+
+def publish_like(post_id, likes):
+    hub.publish([('post', post_id)], 'like', {'post_id': post_id, 'likes': likes})
+
+
+def publish_update(post_id, excerpt, truncated):
+    hub.publish([('post', post_id)], 'update', {'post_id': post_id, 'excerpt': excerpt, 'truncated': truncated})
+
+
+def publish_post(post):
+    hub.publish([('all',), ('author', post.author_id)], 'post', {'post_id': post.id, 'author_id': post.author_id})
+
+
+async def sse_application(scope, receive, send):
+    """ The ASGI application for GET /events?feed=<all|following|user id>&posts=<id,id,...>
+        Streams 'like' and 'update' events for the listed posts, and a 'posts' event with the running count
+        of new posts in the feed. Only for logged in users.
+    """
+    params = parse_qs(scope.get('query_string', b'').decode())
+    user_id = await run_sync(_session_user_id, scope)
+    if user_id is None:
+        await _respond(send, 403)
+        return
+
+    feed = params.get('feed', [''])[0]
+    posts = [int(post_id) for post_id in params.get('posts', [''])[0].split(',') if post_id.isdigit()]
+    topics = {('post', post_id) for post_id in posts[:MAX_POSTS]}
+    if feed == 'all':
+        topics.add(('all',))
+    elif feed == 'following':
+        topics.update(('author', author_id) for author_id in await run_sync(_followed_authors, user_id))
+    elif feed.isdigit():
+        topics.add(('author', int(feed)))
+
+    subscription = Subscription(topics)
+    hub.subscribe(subscription)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stop proxies such as nginx from buffering the stream.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        # Ask browsers to wait before reconnecting, so a restart does not bring every stream back at once.
+        await _send_text(send, 'retry: 10000\n\n')
+        new_posts = 0
+        keepalive = getattr(settings, 'NETWORK_EVENTS_KEEPALIVE', 20)
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait([next_event, disconnected], timeout=keepalive,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_event not in done:
+                next_event.cancel()
+                if not done:
+                    # A comment keeps idle connections open through proxies and load balancers.
+                    await _send_text(send, ': keepalive\n\n')
+                continue
+            kind, data = next_event.result()
+            if kind == 'post':
+                new_posts += 1
+                kind, data = 'posts', {'count': new_posts}
+            await _send_text(send, f'event: {kind}\ndata: {json.dumps(data)}\n\n')
+    finally:
+        hub.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+def _session_user_id(scope):
+    # The id of the user logged in with the session cookie, if any.
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    # As AuthenticationMiddleware does, so a session is refused once its user is inactive or deleted,
+    # or has changed their password since it logged in.
+    user = get_user(SimpleNamespace(session=session))
+    return user.pk if user.is_authenticated else None
+
+
+def _followed_authors(user_id):
+    return list(Follower.objects.filter(follower=user_id).values_list('following_id', flat=True))
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_text(send, text):
+    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+
+async def _respond(send, status):
+    await send({'type': 'http.response.start', 'status': status, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import resolve
+
+from network.models import User
+
+
+class Command(BaseCommand):
+    help = ('Compares the requests per second of the timeline views served over WSGI, by the sync views on a pool '
+            'of threads, and over ASGI, by the async views on an event loop, as uvicorn would serve them. '
+            'Requests go through the full middleware stack in process, so network overhead is left out. '
+            'Run it against a seeded database, see seed_network.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=500, help='The number of requests to make.')
+        parser.add_argument('--concurrency', type=int, default=16, help='The number of requests in flight at once.')
+        parser.add_argument('--username', help='The user to make the requests as, by default the first user.')
+        parser.add_argument('--path', action='append', dest='paths', help='A path to request, by default /posts and /following.')
+
+    def handle(self, *args, **options):
+        options['paths'] = options['paths'] or ['/posts', '/following']
+        if options['server'] == 'both':
+            # Each server runs in its own process, as the views are chosen when the URLs are loaded.
+            for server in ('wsgi', 'asgi'):
+                self._run_in_process(server, options)
+            return
+
+        user = User.objects.filter(username=options['username']) if options['username'] else User.objects.order_by('id')
+        user = user.first()
+        if user is None:
+            raise CommandError('There is no user to make the requests as. Seed the database first with seed_network.')
+        is_async = asyncio.iscoroutinefunction(resolve(options['paths'][0]).func)
+        if is_async != (options['server'] == 'asgi'):
+            raise CommandError(f"Set NETWORK_ASYNC_VIEWS={'1' if options['server'] == 'asgi' else '0'} "
+                               f"to benchmark the {options['server']} views.")
+
+        run = self._run_asgi if options['server'] == 'asgi' else self._run_wsgi
+        # The test clients send requests for the host 'testserver'.
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            start = time.perf_counter()
+            statuses = run(user, options['paths'], options['requests'], options['concurrency'])
+            elapsed = time.perf_counter() - start
+
+        errors = sum(1 for status in statuses if status != 200)
+        self.stdout.write(
+            f"{options['server']}: {len(statuses) / elapsed:.0f} requests/s, {len(statuses)} requests, "
+            f"concurrency {options['concurrency']}, {errors} errors"
+        )
+
+    def _run_in_process(self, server, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_servers', '--server', server,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+        ]
+        if options['username']:
+            command += ['--username', options['username']]
+        for path in options['paths']:
+            command += ['--path', path]
+        environment = dict(os.environ, NETWORK_ASYNC_VIEWS='1' if server == 'asgi' else '0')
+        result = subprocess.run(command, env=environment, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip())
+        self.stdout.write(result.stdout.strip())
+
+    def _run_wsgi(self, user, paths, requests, concurrency):
+        # One thread per request in flight, as a threaded WSGI server such as gunicorn --threads has.
+        statuses = []
+
+        def worker(turns):
+            client = Client()
+            client.force_login(user)
+            try:
+                for turn in turns:
+                    statuses.append(client.get(paths[turn % len(paths)]).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(range(i, requests, concurrency),)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def _run_asgi(self, user, paths, requests, concurrency):
+        # One task per request in flight, all on a single event loop thread.
+        clients = []
+        for _ in range(concurrency):
+            client = AsyncClient()
+            client.force_login(user)
+            clients.append(client)
+
+        async def worker(client, turns):
+            return [(await client.get(paths[turn % len(paths)])).status_code for turn in turns]
+
+        async def serve():
+            results = await asyncio.gather(*[
+                worker(client, range(i, requests, concurrency)) for i, client in enumerate(clients)
+            ])
+            return [status for statuses in results for status in statuses]
+
+        return asyncio.run(serve())
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from network.models import User, Post, Follower, Feedback
+
+
+class Command(BaseCommand):
+    help = ('Shows the query plans (EXPLAIN QUERY PLAN on SQLite) for the hot timeline, follow and like queries. '
+            'Run it before and after migrating to compare the plans.')
+
+    def handle(self, *args, **options):
+        user_id = User.objects.values_list('id', flat=True).first() or 1
+        post_ids = list(Post.objects.order_by('-id').values_list('id', flat=True)[:10]) or [1]
+
+        # Only the columns of the first migrations are read, so the plans can be compared at any of them.
+        columns = ('id', 'created', 'author_id')
+        queries = [
+            ('All posts, newest first',
+             Post.objects.order_by('-created', '-id').values_list(*columns)[:11]),
+            ('Posts by author, newest first',
+             Post.objects.filter(author=user_id).order_by('-created', '-id').values_list(*columns)[:11]),
+            ('Follow option: Follower(follower, following)',
+             Follower.objects.filter(follower=user_id, following=user_id).values_list('id', flat=True)),
+            ('Followers of an author: Follower(following)',
+             Follower.objects.filter(following=user_id).values_list('follower_id', flat=True)),
+            ('Like state for a page: Feedback(reader, post)',
+             Feedback.objects.filter(reader=user_id, opinion=Feedback.LIKE, post__in=post_ids)
+             .values_list('post_id', flat=True)),
+            ('Reader feedback on a post: Feedback(post, reader)',
+             Feedback.objects.filter(post=post_ids[0], reader=user_id).values_list('opinion', flat=True)),
+        ]
+        if _has_column('network_post', 'trending_score'):
+            queries.insert(2, (
+                'Trending posts, highest score first',
+                Post.objects.filter(trending_score__isnull=False).order_by('-trending_score', '-id')
+                .values_list('id', 'trending_score')[:11],
+            ))
+
+        for title, queryset in queries:
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{title} [{_summarise(plan)}]'))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+
+def _has_column(table, column):
+    # Whether the migrations applied so far have added the column.
+    with connection.cursor() as cursor:
+        return column in [field.name for field in connection.introspection.get_table_description(cursor, table)]
+
+
+def _summarise(plan):
+    # A full table scan, or a temporary B-tree for sorting, means no index matched the access path.
+    lines = plan.splitlines()
+    if any('SCAN' in line and 'USING' not in line for line in lines):
+        return 'full scan'
+    if any('TEMP B-TREE' in line for line in lines):
+        return 'sorted in memory'
+    return 'indexed'
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from network.timeline import prune_timelines
+
+
+class Command(BaseCommand):
+    help = ('Trims the precomputed Following timelines that have grown past NETWORK_TIMELINE_LENGTH posts. '
+            'Run it periodically, e.g. from cron.')
+
+    def handle(self, *args, **options):
+        removed = prune_timelines()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} timeline entries.'))
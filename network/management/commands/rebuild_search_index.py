@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from network.models import Post
+from network.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of post text from the Post table.'
+
+    def handle(self, *args, **options):
+        if connections[router.db_for_write(Post)].vendor != 'sqlite':
+            raise CommandError('The full-text search index is only kept on SQLite.')
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index of {Post.objects.count()} posts.'))
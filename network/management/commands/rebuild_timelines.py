@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from network.models import User
+from network.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the precomputed Following timelines from the Follower and Post tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild the timelines for these users.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        total = 0
+        for user in users.iterator():
+            total += rebuild_timeline(user)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt timelines with {total} entries.'))
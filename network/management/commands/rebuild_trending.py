@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from network.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = ('Resets the trending score of every post from its likes and the time each was made. '
+            'Run it after changing NETWORK_TRENDING_HALF_LIFE.')
+
+    def handle(self, *args, **options):
+        scored = rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the trending scores of {scored} liked posts.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from network.auth import forget_users
+from network.models import User, Follower
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the follower and following counters on each User from the Follower table.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = User.objects.update(
+                follower_count=_count_of(Follower.objects.filter(following=OuterRef('pk')), 'following'),
+                following_count=_count_of(Follower.objects.filter(follower=OuterRef('pk')), 'follower'),
+            )
+        # The cached users that requests are identified from hold the old counts.
+        forget_users(*User.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Recounted follows for {updated} users.'))
+
+
+def _count_of(followers, field):
+    # A correlated COUNT(*) subquery, so that every counter is set in a single UPDATE statement.
+    counts = followers.order_by().values(field).annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from network.models import Post, Feedback
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the like count of each Post from the Feedback table.'
+
+    def handle(self, *args, **options):
+        likes = (Feedback.objects.filter(post=OuterRef('pk'), opinion=Feedback.LIKE).order_by()
+                 .values('post').annotate(total=Count('id')).values('total'))
+        with transaction.atomic():
+            updated = Post.objects.update(like_count=Coalesce(Subquery(likes, output_field=IntegerField()), Value(0)))
+        self.stdout.write(self.style.SUCCESS(f'Recounted likes for {updated} posts.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from network.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the 'Who to follow' recommendations of the users whose follows have changed since the last run. "
+            "Run it periodically, e.g. from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute the recommendations of every user.')
+
+    def handle(self, *args, **options):
+        refreshed = refresh_recommendations(everyone=options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed recommendations for {refreshed} users.'))
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from network.seeding import DEFAULT_PASSWORD, generate_records, load_records
+
+
+class Command(BaseCommand):
+    help = ('Bulk loads users, posts, follows and likes, either generated at random or imported from a JSONL file. '
+            f"Loaded users have the password '{DEFAULT_PASSWORD}'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help='A JSONL file of user, post, follow and like records to import.')
+        parser.add_argument('--users', type=int, default=1000, help='The number of users to generate.')
+        parser.add_argument('--posts-per-user', type=int, default=100)
+        parser.add_argument('--follows-per-user', type=int, default=50)
+        parser.add_argument('--likes-per-user', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=50, help='The random seed for generated records.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['input']:
+            with open(options['input']) as lines:
+                records = (json.loads(line) for line in lines if line.strip())
+                loaded = load_records(records, options['batch_size'])
+        else:
+            records = generate_records(
+                options['users'], options['posts_per_user'], options['follows_per_user'],
+                options['likes_per_user'], options['seed'],
+            )
+            loaded = load_records(records, options['batch_size'])
+
+        summary = ', '.join(f'{count} {record_type}s' for record_type, count in loaded.items())
+        self.stdout.write(self.style.SUCCESS(f'Loaded {summary}.'))
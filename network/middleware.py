@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.template.backends.django import Template
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .routers import use_primary
+from .storage import ENCODINGS
+
+logger = logging.getLogger('network.performance')
+
+# The statistics for the request being handled, if it is being sampled.
+# A context variable rather than a thread local, so that async views can carry it into their database threads.
+_stats = ContextVar('network_request_stats', default=None)
+
+
+class RequestStats:
+    # Accumulates the SQL and template timings for a single request.
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        # A database execute_wrapper, so queries are counted without relying on DEBUG query logging.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            # The SQL uses placeholders for its parameters, so identical text means an identical query shape.
+            self.shapes[sql] += 1
+
+    def repeated_shapes(self, threshold):
+        return {sql: count for sql, count in self.shapes.items() if count >= threshold}
+
+
+class PerformanceMiddleware:
+    """ Records the view name, SQL query count and time, template render time and total time of each request.
+        The timings are returned in a Server-Timing header and written as a JSON log line
+        to the 'network.performance' logger, with a warning when the same query shape repeats (N+1 queries).
+        Only a NETWORK_PERF_SAMPLE_RATE fraction of requests is measured.
+        Works under WSGI and ASGI: queries are counted by record_query, on whichever thread they are made,
+        and template renders by time_template_renders.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'NETWORK_PERF_SAMPLE_RATE', 1.0)
+        self.repeat_threshold = getattr(settings, 'NETWORK_PERF_REPEAT_THRESHOLD', 3)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        self._report(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+        self._report(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def _sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _report(self, request, response, stats, total_time):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        record = {
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'total_ms': round(total_time * 1000, 2),
+        }
+        repeated = stats.repeated_shapes(self.repeat_threshold)
+        if repeated:
+            record['repeated_queries'] = repeated
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+def record_query(execute, sql, params, many, context):
+    """ A database execute_wrapper, installed on every connection by network/signals.py, that counts each query
+        towards the statistics of the request being sampled. Under ASGI, Django runs sync views and middleware,
+        and the async views their queries, on other threads, which the statistics follow in a context variable.
+    """
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+class ReplicaStickinessMiddleware:
+    """ Gives users read-your-writes consistency when reads go to a replica (see network.routers).
+        Requests that write (anything but GET, HEAD and OPTIONS) read from the primary, and so does every
+        request in the same session for the next NETWORK_REPLICA_STICKY_SECONDS, until the replica has caught up.
+        Sessions are used rather than users so that the user itself is loaded from the right database.
+        Must come after SessionMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = use_primary.set(self._sticky(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        self._stick(request)
+        return response
+
+    async def __acall__(self, request):
+        token = use_primary.set(self._sticky(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        self._stick(request)
+        return response
+
+    def _sticky(self, request):
+        if request.method not in self.safe_methods:
+            return True
+        session_key = request.session.session_key
+        return session_key is not None and cache.get(_sticky_key(session_key), False)
+
+    def _stick(self, request):
+        # Logging in or out changes the session key, so it is read again after the view.
+        session_key = request.session.session_key
+        if request.method not in self.safe_methods and session_key is not None:
+            cache.set(_sticky_key(session_key), True, getattr(settings, 'NETWORK_REPLICA_STICKY_SECONDS', 5))
+
+
+class StaticFilesMiddleware:
+    """ Serves the static files that collectstatic gathered in STATIC_ROOT (see network/storage.py).
+        Browsers that accept brotli or gzip are sent the copy compressed at collectstatic time, so nothing is
+        compressed while serving. Names containing a content hash never change, so they are cached for a year as
+        immutable, and repeat visits do not revalidate them; other names are revalidated by modification time.
+        Static requests go no further, so it comes straight after SecurityMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+    cache_forever = 'public, max-age=31536000, immutable'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.hashed_names = None
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self._serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Finding and opening a local file is quick, and the server streams the body, so this stays on the loop.
+        return self._serve(request) or await self.get_response(request)
+
+    def _serve(self, request):
+        # Returns the response for a collected static file, or None to pass the request on.
+        if request.method not in ('GET', 'HEAD') or not settings.STATIC_ROOT \
+                or not request.path.startswith(settings.STATIC_URL):
+            return None
+        name = request.path[len(settings.STATIC_URL):]
+        if name.endswith(tuple(suffix for encoding, suffix in ENCODINGS)):
+            # The compressed copies are only sent in place of their original, with a Content-Encoding.
+            return None
+        try:
+            path = staticfiles_storage.path(name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        if self.hashed_names is None:
+            self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        immutable = name in self.hashed_names
+        modified = os.stat(path).st_mtime
+        if not immutable and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), modified):
+            return HttpResponseNotModified()
+
+        encoding = next((
+            (encoding, suffix) for encoding, suffix in ENCODINGS
+            if encoding in _accepted_encodings(request) and os.path.isfile(path + suffix)
+        ), None)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if encoding is not None:
+            response = FileResponse(open(path + encoding[1], 'rb'), content_type=content_type)
+            response['Content-Encoding'] = encoding[0]
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        response['Cache-Control'] = self.cache_forever if immutable else 'public, max-age=0, must-revalidate'
+        response['Last-Modified'] = http_date(modified)
+        return response
+
+
+def _accepted_encodings(request):
+    # The content codings in the request's Accept-Encoding header, leaving out any refused with q=0.
+    accepted = set()
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, quality = coding.strip().partition(';')
+        if quality.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _sticky_key(session_key):
+    return f'network:primary:{session_key}'
+
+
+def time_template_renders():
+    # Wraps the Django template backend's render, once, so that sampled requests can add up their render time.
+    # Installed by NetworkConfig.ready() when NETWORK_PERF_SAMPLE_RATE samples any requests.
+    if getattr(Template.render, 'timed', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        stats = _stats.get()
+        if stats is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+    timed_render.timed = True
+    Template.render = timed_render
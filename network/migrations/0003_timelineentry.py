@@ -0,0 +1,51 @@
+# Generated by Django 3.1 on 2026-10-18 07:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_timelines(apps, schema_editor):
+    # Fills the new timelines from the existing Follower and Post records.
+    User = apps.get_model('network', 'User')
+    Post = apps.get_model('network', 'Post')
+    Follower = apps.get_model('network', 'Follower')
+    TimelineEntry = apps.get_model('network', 'TimelineEntry')
+    length = getattr(settings, 'NETWORK_TIMELINE_LENGTH', 500)
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        authors = Follower.objects.filter(follower=user_id).values_list('following_id', flat=True)
+        posts = Post.objects.filter(author__in=authors).order_by('-created', '-id').values_list('id', 'created')
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=user_id, post_id=post_id, created=created) for post_id, created in posts[:length]],
+            batch_size=500,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0002_feedback_follower_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='network.post')),
+            ],
+            options={
+                'verbose_name_plural': 'Timeline entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', '-created', '-post'], name='timeline_owner_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(build_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.1 on 2026-10-18 07:35
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keeps the earliest Follower and Feedback record of any duplicates, so the unique constraints can be added.
+    for model_name, fields in (('Follower', ('follower', 'following')), ('Feedback', ('reader', 'post'))):
+        model = apps.get_model('network', model_name)
+        duplicates = model.objects.values(*fields).annotate(first=Min('id'), records=Count('id')).filter(records__gt=1)
+        for duplicate in duplicates:
+            match = {field: duplicate[field] for field in fields}
+            model.objects.filter(**match).exclude(id=duplicate['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['post', 'reader'], name='feedback_post_reader_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follower',
+            index=models.Index(fields=['following', 'follower'], name='follower_following_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created', '-id'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created', '-id'], name='post_author_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedback',
+            constraint=models.UniqueConstraint(fields=('reader', 'post'), name='unique_feedback'),
+        ),
+        migrations.AddConstraint(
+            model_name='follower',
+            constraint=models.UniqueConstraint(fields=('follower', 'following'), name='unique_follower'),
+        ),
+    ]
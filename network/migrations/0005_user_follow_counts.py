@@ -0,0 +1,39 @@
+# Generated by Django 3.1 on 2026-10-18 07:37
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_follows(apps, schema_editor):
+    # Sets the new counters from the existing Follower records.
+    User = apps.get_model('network', 'User')
+    Follower = apps.get_model('network', 'Follower')
+
+    def count_of(field):
+        counts = (Follower.objects.filter(**{field: OuterRef('pk')}).order_by()
+                  .values(field).annotate(total=Count('id')).values('total'))
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    User.objects.update(follower_count=count_of('following'), following_count=count_of('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
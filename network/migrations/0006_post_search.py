@@ -0,0 +1,54 @@
+# Generated by Django 3.1 on 2026-10-18 09:12
+
+from django.db import migrations
+
+SEARCH_TABLE = 'network_post_search'
+
+# An FTS5 index over the text of each post, ranked with bm25. It is an external content table,
+# so it stores only the index and reads the text from network_post, by post id (the rowid).
+# The triggers keep it in step with every insert, delete and change of text, including bulk loads.
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    f"text, content='network_post', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END",
+    # Only a change to the text touches the index, so likes and other updates leave it alone.
+    f"CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE OF text ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+    # Index the existing posts.
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases fall back to a scan in network/search.py.
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0005_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1 on 2026-10-18 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0006_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recommendations_stale',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mutual_follows', models.IntegerField()),
+                ('co_likes', models.IntegerField()),
+                ('score', models.FloatField()),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_to', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['owner', '-score'], name='recommendation_owner_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(fields=('owner', 'candidate'), name='unique_recommendation'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1 on 2026-10-18 08:07
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def score_posts(apps, schema_editor):
+    # Scores the existing posts from their like counts, counting each like as made when its post was.
+    Post = apps.get_model('network', 'Post')
+    epoch = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    half_life = getattr(settings, 'NETWORK_TRENDING_HALF_LIFE', 6) * 3600
+    batch = []
+    for post_id, created, like_count in Post.objects.filter(like_count__gt=0).values_list('id', 'created', 'like_count').iterator():
+        score = (created - epoch).total_seconds() / half_life + math.log2(like_count)
+        batch.append(Post(id=post_id, trending_score=score))
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['trending_score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0007_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.RunPython(score_posts, migrations.RunPython.noop),
+    ]
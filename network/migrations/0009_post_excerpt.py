@@ -0,0 +1,45 @@
+# Generated by Django 3.1 on 2026-10-18 08:14
+
+from django.db import migrations, models
+
+EXCERPT_LENGTH = 280
+
+
+def excerpt_posts(apps, schema_editor):
+    # Computes the excerpts of the existing posts, as network.models.excerpt_of does.
+    Post = apps.get_model('network', 'Post')
+    batch = []
+    for post_id, text in Post.objects.values_list('id', 'text').iterator():
+        excerpt, truncated = text, False
+        if len(text) > EXCERPT_LENGTH:
+            excerpt, truncated = text[:EXCERPT_LENGTH], True
+            space = excerpt.rfind(' ')
+            if space > EXCERPT_LENGTH // 2:
+                excerpt = excerpt[:space]
+            excerpt = excerpt.rstrip()
+        batch.append(Post(id=post_id, excerpt=excerpt, truncated=truncated))
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['excerpt', 'truncated'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt', 'truncated'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0008_post_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=280),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(excerpt_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.1 on 2026-10-18 10:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def date_likes(apps, schema_editor):
+    # The likes made so far were scored as if made when their post was (see 0008), so they are dated that way.
+    Feedback = apps.get_model('network', 'Feedback')
+    Post = apps.get_model('network', 'Post')
+    Feedback.objects.update(liked_at=Subquery(Post.objects.filter(id=OuterRef('post_id')).values('created')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0009_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='liked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(date_likes, migrations.RunPython.noop),
+    ]
@@ -1,21 +1,61 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+# Timelines show up to EXCERPT_LENGTH characters of each post, and fetch the full text when a reader expands it.
+EXCERPT_LENGTH = 280
+
+
+def excerpt_of(text):
+    # Returns the excerpt of a post's text, and whether the text is longer than it.
+    # A long text is cut at the last space before the limit, unless that would lose more than half of it.
+    if len(text) <= EXCERPT_LENGTH:
+        return text, False
+    excerpt = text[:EXCERPT_LENGTH]
+    space = excerpt.rfind(' ')
+    if space > EXCERPT_LENGTH // 2:
+        excerpt = excerpt[:space]
+    return excerpt.rstrip(), True
+
 
 class User(AbstractUser):
-    # Add Follower IDs to User
+    # Follower counts are kept on the User, so that profiles need no aggregation.
+    # They are maintained by the follow view, and can be recomputed with `manage.py recount_follows`.
+    follower_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    # Set when the user follows or unfollows someone, so `manage.py refresh_recommendations`
+    # knows whose 'Who to follow' suggestions need recomputing.
+    recommendations_stale = models.BooleanField(default=True)
 
     def __str__(self):
         return f'{self.username}'
 
 # Posts Class
 class Post(models.Model):
+    class Meta:
+        indexes = [
+            # Timelines read posts newest first, for everyone or for one author.
+            models.Index(fields=['-created', '-id'], name='post_created_idx'),
+            models.Index(fields=['author', '-created', '-id'], name='post_author_created_idx'),
+            # The trending feed reads posts in score order.
+            models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ]
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='authors')
     text = models.TextField()
     like_count = models.IntegerField(default=0)
+    # The time-decayed like score that ranks the trending feed, see network/trending.py.
+    trending_score = models.FloatField(null=True, blank=True)
+    # What the timelines show in place of the text, which they never load, and whether the text is longer.
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')
+    truncated = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        # Keep the excerpt in step with the text, unless the text was not loaded and so cannot have changed.
+        if 'text' not in self.get_deferred_fields():
+            self.excerpt, self.truncated = excerpt_of(self.text)
+        super().save(*args, **kwargs)
+
     def published(self):
         return self.created.strftime('%B %d %Y')
 
@@ -23,6 +63,13 @@ class Post(models.Model):
         return f'{self.author}: {self.published()}'
 
 class Follower(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['following', 'follower'], name='follower_following_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'following'], name='unique_follower'),
+        ]
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
     following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follows')
 
@@ -32,6 +79,12 @@ class Follower(models.Model):
 class Feedback(models.Model):
     class Meta:
         verbose_name_plural = 'Feedback'
+        indexes = [
+            models.Index(fields=['post', 'reader'], name='feedback_post_reader_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['reader', 'post'], name='unique_feedback'),
+        ]
     LIKE = 'L'
     UNLIKE = 'U'
 
@@ -42,7 +95,49 @@ class Feedback(models.Model):
     reader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='readers')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='posts')
     opinion = models.CharField(max_length=1, choices=OPINION_CHOICES)
+    # When the reader last liked the post, kept after an unlike so that it takes back the weight that like added
+    # to the trending score. Likes made before it was recorded are counted as made when their post was.
+    liked_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f'reader: {self.reader} post ID: {self.post.id} opinion is {self.opinion}'
+        return f'reader: {self.reader} post ID: {self.post_id} opinion is {self.opinion}'
 
+
+class TimelineEntry(models.Model):
+    # A post from a followed author, written ahead of time into the owner's Following timeline.
+    class Meta:
+        verbose_name_plural = 'Timeline entries'
+        indexes = [
+            models.Index(fields=['owner', '-created', '-post'], name='timeline_owner_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_timeline_entry'),
+        ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # A copy of the post's created timestamp, so the timeline can be read in order from one index.
+    created = models.DateTimeField()
+
+    def __str__(self):
+        return f'owner: {self.owner} post ID: {self.post_id}'
+
+
+class Recommendation(models.Model):
+    # An author suggested to the owner in 'Who to follow', precomputed by `manage.py refresh_recommendations`.
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-score'], name='recommendation_owner_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'candidate'], name='unique_recommendation'),
+        ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommended_to')
+    # The number of authors the owner follows who follow the candidate,
+    # and the number of posts that both the owner and the candidate like.
+    mutual_follows = models.IntegerField()
+    co_likes = models.IntegerField()
+    score = models.FloatField()
+
+    def __str__(self):
+        return f'owner: {self.owner} candidate: {self.candidate} score: {self.score}'
@@ -0,0 +1,119 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+
+
+class CursorPage:
+    """ A page of posts found by keyset (cursor) pagination on (created, id).
+        Each page is a single indexed range read, so deep pages cost the same as the first.
+        Exposes enough of the Django Page interface for the templates to use it in place of one.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        # The total number of posts is optional, as it needs a COUNT(*) over the whole table.
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(direction, item, key=('created', 'id')):
+    # Builds an opaque token marking a position in the timeline, either after ('n') or before ('p') the item.
+    # The ordering field is a timestamp, or a score for the trending feed.
+    created, tiebreak = (getattr(item, field) for field in key)
+    value = created.isoformat() if isinstance(created, datetime) else repr(created)
+    raw = f'{direction}|{value}|{tiebreak}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    # Returns a (direction, created, id) tuple, or None if the token is missing or cannot be read.
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, created, post_id = raw.split('|')
+        if direction not in ('n', 'p'):
+            return None
+        return direction, _cursor_value(created), int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _cursor_value(value):
+    # A score is written as a float, which no timestamp can be read as.
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def paginate_by_cursor(posts, token, per_page=10, with_count=False, key=('created', 'id')):
+    """ Returns a CursorPage of posts, newest first, starting from the position given by the cursor token.
+        An absent or unreadable token returns the first page.
+        The key names the timestamp field and the unique tie-break field that the rows are ordered by.
+    """
+    count = posts.count() if with_count else None
+    cursor = decode_cursor(token)
+    created_field, id_field = key
+    if cursor is not None and isinstance(cursor[1], datetime) != isinstance(
+            posts.model._meta.get_field(created_field), models.DateTimeField):
+        # A cursor from a feed with the other kind of ordering is read as no cursor.
+        cursor = None
+
+    if cursor is None:
+        rows = list(posts.order_by(f'-{created_field}', f'-{id_field}')[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = False
+        has_older = more
+    else:
+        direction, created, post_id = cursor
+        if direction == 'n':
+            # Older posts, following on after the cursor.
+            rows = list(
+                posts.filter(
+                    Q(**{f'{created_field}__lt': created})
+                    | Q(**{created_field: created, f'{id_field}__lt': post_id})
+                ).order_by(f'-{created_field}', f'-{id_field}')[:per_page + 1]
+            )
+            more = len(rows) > per_page
+            rows = rows[:per_page]
+            has_newer = True
+            has_older = more
+        else:
+            # Newer posts, leading up to the cursor, read in ascending order and then flipped.
+            rows = list(
+                posts.filter(
+                    Q(**{f'{created_field}__gt': created})
+                    | Q(**{created_field: created, f'{id_field}__gt': post_id})
+                ).order_by(created_field, id_field)[:per_page + 1]
+            )
+            more = len(rows) > per_page
+            rows = rows[:per_page]
+            rows.reverse()
+            has_newer = more
+            has_older = True
+
+    next_cursor = encode_cursor('n', rows[-1], key) if rows and has_older else None
+    prev_cursor = encode_cursor('p', rows[0], key) if rows and has_newer else None
+    return CursorPage(rows, next_cursor, prev_cursor, count)
@@ -0,0 +1,45 @@
+""" A bounded pool of threads for the blocking work of the async views: ORM queries and template rendering.
+    The Django ORM is synchronous, so an async view hands each piece of database work to the pool and awaits it,
+    leaving the event loop free to serve other requests. Independent queries can be awaited together.
+    The pool has NETWORK_ASYNC_DB_THREADS threads, which caps the database connections the async views hold open.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = Lock()
+
+
+def executor():
+    # The pool is created on first use, so that the setting can be changed before then, e.g. in tests.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'NETWORK_ASYNC_DB_THREADS', 8), thread_name_prefix='network-db',
+            )
+        return _executor
+
+
+async def run_sync(function, *args, **kwargs):
+    """ Runs a blocking function on the pool and returns its result.
+        The caller's context variables, such as the replica stickiness, are carried across to the pool thread.
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, function, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor(), call)
+
+
+def _call(function, args, kwargs):
+    # As at the start and end of a request, drop any connection that has errored or outlived CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
@@ -0,0 +1,120 @@
+""" 'Who to follow' recommendations, precomputed in a batch job (`manage.py refresh_recommendations`).
+    A candidate is scored by the number of authors the user follows who also follow the candidate
+    (friends of friends), plus NETWORK_RECOMMEND_COLIKE_WEIGHT for each post that both of them like.
+    The follow and like graphs are held as compressed integer arrays rather than model instances,
+    and the top NETWORK_RECOMMENDATIONS candidates for each user are stored, so a profile page reads them in one query.
+"""
+import heapq
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import User, Follower, Feedback, Recommendation
+
+
+class Adjacency:
+    """ A directed graph over integer ids, in compressed sparse row form:
+        the neighbours of node n are targets[offsets[n]:offsets[n + 1]].
+        Built from (source, target) pairs sorted by source, it takes 8 bytes per edge and per node.
+    """
+
+    def __init__(self, pairs, size):
+        self.offsets = array('q', bytes(8 * (size + 1)))
+        self.targets = array('q')
+        for source, target in pairs:
+            self.targets.append(target)
+            self.offsets[source + 1] += 1
+        for node in range(size):
+            self.offsets[node + 1] += self.offsets[node]
+        self.size = size
+
+    def neighbours(self, node):
+        if node >= self.size:
+            return ()
+        return memoryview(self.targets)[self.offsets[node]:self.offsets[node + 1]]
+
+
+def refresh_recommendations(everyone=False, batch_size=500):
+    """ Recomputes the recommendations of every user whose follows changed since the last run,
+        and of their followers, whose friends of friends changed with them. Returns the number of users recomputed.
+    """
+    if everyone:
+        stale = list(User.objects.order_by('id').values_list('id', flat=True))
+    else:
+        stale = list(User.objects.filter(recommendations_stale=True).order_by('id').values_list('id', flat=True))
+    if not stale:
+        return 0
+    # The flags are cleared before the graph is read, so a follow made during the run marks the user for the next one.
+    for start in range(0, len(stale), batch_size):
+        User.objects.filter(id__in=stale[start:start + batch_size]).update(recommendations_stale=False)
+
+    users = set(stale)
+    for start in range(0, len(stale), batch_size):
+        users.update(Follower.objects.filter(following__in=stale[start:start + batch_size])
+                     .values_list('follower_id', flat=True))
+
+    # The graphs are sized by the highest ids, so they are read in one snapshot in which no later ids exist.
+    with transaction.atomic():
+        size = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        follows = Adjacency(
+            Follower.objects.order_by('follower_id', 'following_id').values_list('follower_id', 'following_id')
+            .iterator(chunk_size=10000),
+            size,
+        )
+        colike_weight = getattr(settings, 'NETWORK_RECOMMEND_COLIKE_WEIGHT', 0.0)
+        likes = liked_by = None
+        if colike_weight:
+            liked = Feedback.objects.filter(opinion=Feedback.LIKE)
+            likes = Adjacency(liked.order_by('reader_id', 'post_id').values_list('reader_id', 'post_id')
+                              .iterator(chunk_size=10000), size)
+            post_count = (liked.aggregate(last=Max('post_id'))['last'] or 0) + 1
+            liked_by = Adjacency(liked.order_by('post_id', 'reader_id').values_list('post_id', 'reader_id')
+                                 .iterator(chunk_size=10000), post_count)
+
+    limit = getattr(settings, 'NETWORK_RECOMMENDATIONS', 10)
+    users = sorted(users)
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        rows = [
+            Recommendation(owner_id=user_id, candidate_id=candidate, mutual_follows=mutual, co_likes=co_likes, score=score)
+            for user_id in batch
+            for score, candidate, mutual, co_likes in score_candidates(
+                user_id, follows, likes, liked_by, colike_weight, limit,
+            )
+        ]
+        with transaction.atomic():
+            Recommendation.objects.filter(owner__in=batch).delete()
+            Recommendation.objects.bulk_create(rows, batch_size=batch_size)
+    return len(users)
+
+
+def score_candidates(user_id, follows, likes, liked_by, colike_weight, limit):
+    # Returns the best (score, candidate, mutual follows, co-likes) tuples for the user, highest score first.
+    followed = set(follows.neighbours(user_id))
+    mutual = Counter()
+    for friend in followed:
+        mutual.update(follows.neighbours(friend))
+    co_likes = Counter()
+    if likes is not None:
+        for post_id in likes.neighbours(user_id):
+            co_likes.update(liked_by.neighbours(post_id))
+
+    excluded = followed | {user_id}
+    scored = (
+        (mutual[candidate] + colike_weight * co_likes[candidate], candidate, mutual[candidate], co_likes[candidate])
+        for candidate in (mutual.keys() | co_likes.keys()) - excluded
+    )
+    return heapq.nlargest(limit, scored)
+
+
+def who_to_follow(user, limit=5):
+    # The user's best recommendations, leaving out anyone they have followed since the last refresh.
+    return (
+        Recommendation.objects.filter(owner=user)
+        .exclude(candidate__in=Follower.objects.filter(follower=user).values('following'))
+        .select_related('candidate')
+        .order_by('-score')[:limit]
+    )
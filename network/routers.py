@@ -0,0 +1,34 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set for the duration of a request that must read from the primary, see ReplicaStickinessMiddleware.
+use_primary = ContextVar('network_use_primary', default=False)
+
+
+class ReplicaRouter:
+    """ Sends reads of the network models (timelines, profiles, likes and follows) to the NETWORK_REPLICA_DATABASE
+        alias, and every write to the primary.
+        Reads stay on the primary while it is inside a transaction, so that the transaction sees its own writes,
+        and while use_primary is set, so that users see their own recent posts, likes and follows.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'NETWORK_REPLICA_DATABASE', None)
+        if not replica or model._meta.app_label != 'network':
+            return None
+        if use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary, so objects read from either can be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is kept in step with the primary, rather than migrated itself.
+        return db != getattr(settings, 'NETWORK_REPLICA_DATABASE', None)
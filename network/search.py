@@ -0,0 +1,85 @@
+""" Full-text search over the text of posts.
+    On SQLite the posts are found in the FTS5 index created by migration 0006_post_search, best match first
+    by bm25 rank. Triggers keep the index in step with the posts; rebuild_search_index recreates it.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Post
+from .pagination import CursorPage
+
+SEARCH_TABLE = 'network_post_search'
+
+# Keep the index in step with every insert, delete and change of text, including bulk loads.
+# Only a change to the text touches the index, so likes and other updates leave it alone.
+# SQLite drops these whenever a migration rebuilds network_post, so they are reinstalled after every migrate.
+TRIGGERS_SQL = [
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF text ON network_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+]
+
+
+def match_expression(query):
+    # Turns what the user typed into an FTS5 query for posts containing every word.
+    # Each word is quoted, so operators and punctuation in the query are taken literally.
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def search_posts(query, token, per_page=10):
+    """ Returns a CursorPage of the posts matching every word of the query, best match first.
+        Results are ranked rather than ordered by time, so the cursor tokens are offsets into the ranking.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return CursorPage([])
+    offset = int(token) if token.isdigit() else 0
+    posts = Post.objects.select_related('author').defer('text')
+    connection = connections[posts.db]
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+                [match_expression(query), per_page + 1, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        more = len(ids) > per_page
+        found = posts.in_bulk(ids[:per_page])
+        rows = [found[post_id] for post_id in ids[:per_page] if post_id in found]
+    else:
+        # Without an FTS5 index, fall back to scanning for each word, newest first.
+        matching = Q()
+        for word in words:
+            matching &= Q(text__icontains=word)
+        rows = list(posts.filter(matching).order_by('-created', '-id')[offset:offset + per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+    next_cursor = str(offset + per_page) if more else None
+    prev_cursor = str(max(offset - per_page, 0)) if offset else None
+    return CursorPage(rows, next_cursor, prev_cursor)
+
+
+def install_triggers(connection):
+    # Creates any of the triggers that are missing, if the search index exists.
+    if SEARCH_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for sql in TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def rebuild_index():
+    # Reindexes every post from network_post, and merges the index into as few segments as possible.
+    connection = connections[router.db_for_write(Post)]
+    install_triggers(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
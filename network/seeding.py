@@ -0,0 +1,161 @@
+""" Bulk loading of users, posts, follows and likes, for load testing with large synthetic datasets.
+    Records are plain dicts with a 'type' of 'user', 'post', 'follow' or 'like', as in the JSONL import format:
+
+        {"type": "user", "id": 1, "username": "user1"}
+        {"type": "post", "id": 1, "author": 1, "text": "Hello", "created": "2020-08-24T07:38:00+00:00"}
+        {"type": "follow", "follower": 2, "following": 1}
+        {"type": "like", "reader": 2, "post": 1, "liked_at": "2020-08-24T09:12:00+00:00"}
+
+    Records are streamed into the database with bulk_create in batches, so memory stays flat however many there are.
+    A record may only refer to users and posts that appear before it. A like without a liked_at counts as made with its post.
+    The like and follow counters and the Following timelines are computed once, after everything is loaded.
+"""
+import os
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import User, Post, Follower, Feedback, excerpt_of
+
+DEFAULT_PASSWORD = 'password'
+
+
+def generate_records(users, posts_per_user, follows_per_user, likes_per_user, seed=50):
+    """ Yields the records of a random social graph, numbering the new users and posts after any existing ones.
+        Posts are spread over the last 30 days.
+    """
+    rng = random.Random(seed)
+    first_user = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    first_post = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    user_ids = range(first_user, first_user + users)
+    post_ids = range(first_post, first_post + users * posts_per_user)
+    now = timezone.now()
+
+    for user_id in user_ids:
+        yield {'type': 'user', 'id': user_id, 'username': f'user{user_id}'}
+
+    post_id = first_post
+    for user_id in user_ids:
+        for _ in range(posts_per_user):
+            created = now - timedelta(seconds=rng.randint(0, 30 * 24 * 60 * 60))
+            text = f'Post {post_id} by user{user_id}. ' * rng.randint(1, 20)
+            yield {'type': 'post', 'id': post_id, 'author': user_id, 'text': text, 'created': created}
+            post_id += 1
+
+    for user_id in user_ids:
+        # Sample one spare author, in case the user is drawn as one of their own.
+        authors = [author_id for author_id in rng.sample(user_ids, min(follows_per_user + 1, users)) if author_id != user_id]
+        for author_id in authors[:follows_per_user]:
+            yield {'type': 'follow', 'follower': user_id, 'following': author_id}
+
+    for user_id in user_ids:
+        for liked_id in rng.sample(post_ids, min(likes_per_user, len(post_ids))):
+            yield {'type': 'like', 'reader': user_id, 'post': liked_id}
+
+
+def load_records(records, batch_size=5000):
+    """ Bulk creates the records, and then brings every counter and timeline in line with them.
+        Returns the number of records loaded of each type.
+    """
+    password = make_password(DEFAULT_PASSWORD)
+    builders = {
+        'user': lambda record: User(
+            id=record.get('id'), username=record['username'], email=record.get('email', ''), password=password,
+        ),
+        'post': _build_post,
+        'follow': lambda record: Follower(follower_id=record['follower'], following_id=record['following']),
+        'like': lambda record: Feedback(
+            reader_id=record['reader'], post_id=record['post'], opinion=record.get('opinion', Feedback.LIKE),
+            liked_at=_timestamp(record['liked_at']) if record.get('liked_at') else None,
+        ),
+    }
+    # Parents are written before children, so each flush satisfies the foreign keys of the next.
+    models = {'user': User, 'post': Post, 'follow': Follower, 'like': Feedback}
+    pending = {record_type: [] for record_type in models}
+    loaded = {record_type: 0 for record_type in models}
+
+    def flush():
+        with transaction.atomic():
+            for record_type, model in models.items():
+                if pending[record_type]:
+                    model.objects.bulk_create(pending[record_type], batch_size=batch_size, ignore_conflicts=True)
+                    loaded[record_type] += len(pending[record_type])
+                    pending[record_type].clear()
+
+    with _bulk_load_pragmas(), _keep_post_timestamps():
+        waiting = 0
+        for record in records:
+            pending[record['type']].append(builders[record['type']](record))
+            waiting += 1
+            if waiting >= batch_size:
+                flush()
+                waiting = 0
+        flush()
+
+    recount()
+    return loaded
+
+
+def _build_post(record):
+    # bulk_create skips Post.save, so the excerpt is computed here.
+    excerpt, truncated = excerpt_of(record['text'])
+    return Post(
+        id=record.get('id'), author_id=record['author'], text=record['text'], excerpt=excerpt, truncated=truncated,
+        created=_timestamp(record.get('created')), updated=_timestamp(record.get('created')),
+    )
+
+
+def recount():
+    # Computes the like and follow counters, and rebuilds the Following timelines and trending scores.
+    with open(os.devnull, 'w') as quiet:
+        call_command('recount_likes', stdout=quiet)
+        call_command('recount_follows', stdout=quiet)
+        call_command('rebuild_timelines', stdout=quiet)
+        call_command('rebuild_trending', stdout=quiet)
+
+
+def _timestamp(value):
+    if value is None:
+        return timezone.now()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+@contextmanager
+def _bulk_load_pragmas():
+    # On SQLite, write ahead logging and relaxed syncing make large loads far faster.
+    # Neither can be changed inside a transaction, so a load within one runs with the settings it has.
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+@contextmanager
+def _keep_post_timestamps():
+    # Post.created and Post.updated are set automatically on save, which would overwrite the loaded timestamps.
+    fields = [Post._meta.get_field('created'), Post._meta.get_field('updated')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """ Tunes each new SQLite connection with the NETWORK_SQLITE_PRAGMAS setting,
+        e.g. write ahead logging so that readers and the writer do not block each other,
+        and a busy timeout so that writers queue for the lock rather than failing with 'database is locked'.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'NETWORK_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Counts the connection's queries for the PerformanceMiddleware. Installed first, so that
+    # connection.execute_wrapper() blocks, which remove the last wrapper when they end, leave it in place.
+    from .middleware import record_query
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_search_triggers(sender, using, **kwargs):
+    """ Reinstalls the triggers that keep the search index in step with the posts.
+        SQLite rebuilds a table to alter it, which drops its triggers, so a migration of Post would otherwise stop
+        new and edited posts from being indexed.
+    """
+    from .search import install_triggers
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        install_triggers(connection)
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    # The user's row changed, so the copy that requests are served from is out of date.
+    from .auth import forget_users
+    forget_users(instance.pk)
+
+
+def cache_logged_in_user(sender, request, user, **kwargs):
+    # Caches the user as they log in, so that even their first request needs no query to identify them.
+    from .auth import remember_user
+    remember_user(user)
+
+
+def forget_logged_out_user(sender, request, user, **kwargs):
+    from .auth import forget_users
+    if user is not None:
+        forget_users(user.pk)
@@ -0,0 +1,60 @@
+""" The static files storage that `manage.py collectstatic` builds STATIC_ROOT with.
+    As Django's ManifestStaticFilesStorage does, it copies each file under a name containing a hash of its content,
+    recorded in staticfiles.json, so that the {% static %} tag links to a name that changes whenever the file does.
+    It also writes a gzip copy of each text file, and a brotli copy where the brotli package is installed,
+    for network.middleware.StaticFilesMiddleware to serve, so that nothing is compressed while serving.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml')
+
+# The content encodings of the compressed copies, best first, and the suffix each copy's name has.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress(encoding, data):
+    # Returns the data compressed with the encoding, or None if it cannot be here.
+    if encoding == 'gzip':
+        return gzip.compress(data, 9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Each file is kept under its own name and its final hashed name; the hashing passes' other names are gone.
+        for name in sorted(paths):
+            if name.endswith(COMPRESSIBLE):
+                self._write_compressed(name)
+                self._write_compressed(self.stored_name(name))
+
+    def stored_name(self, name):
+        # Before collectstatic has been run, e.g. in tests, link to files under their own names.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def _write_compressed(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for encoding, suffix in ENCODINGS:
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            compressed = compress(encoding, data)
+            # Only keep copies that are smaller, which tiny files may not be.
+            if compressed is not None and len(compressed) < len(data):
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,141 @@
+""" Rate limiting and admission control for the views that write, which all queue for the one SQLite writer lock.
+    Each write view names a scope in NETWORK_WRITE_LIMITS, which gives its token buckets and how long it may queue:
+    every user, and every client IP, may make `rate` writes a second, in bursts of up to `burst`, or is refused
+    with 429 Too Many Requests and a Retry-After. IP buckets are NETWORK_WRITE_LIMIT_IP_FACTOR times larger, as
+    many users may share an address. The buckets are kept in the default cache, so are shared by server processes
+    that share it, though only approximately, as updates from different processes are not atomic.
+    Admitted writes then take one of the NETWORK_WRITERS slots of the process, waiting up to the scope's `queue`
+    seconds for one to free, and are otherwise shed with 503 Service Unavailable rather than piling up on the lock.
+    Sync views served under ASGI share a single thread, so they do not wait for a slot but are shed straight away.
+"""
+import asyncio
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+
+from .pool import run_sync
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The cache offers no atomic read-modify-write, so buckets are updated under a lock within each process.
+# Processes sharing the cache can still interleave, and each may then let through a write the bucket had no token for.
+_bucket_lock = threading.Lock()
+_writers = None
+_writers_lock = threading.Lock()
+
+
+def take_tokens(buckets):
+    """ Takes a token from each of the buckets, given as (key, rate, burst) and refilled at rate tokens a second
+        up to burst, but only if every one of them has a token, so a refused request takes nothing.
+        Returns 0 if they all did, otherwise the number of seconds until they will.
+    """
+    now = time.time()
+    with _bucket_lock:
+        wait, taken = 0, {}
+        for key, rate, burst in buckets:
+            tokens, updated = cache.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            taken[key] = (tokens - 1, now)
+        if wait:
+            return wait
+        # An untouched bucket refills completely, so it can expire once it would have.
+        cache.set_many(taken, math.ceil(max(burst / rate for key, rate, burst in buckets)) + 1)
+    return 0
+
+
+def writers():
+    # The write slots of this process.
+    global _writers
+    with _writers_lock:
+        if _writers is None:
+            _writers = threading.BoundedSemaphore(getattr(settings, 'NETWORK_WRITERS', 4))
+    return _writers
+
+
+def rate_limited(scope):
+    """ Limits the unsafe requests (e.g. POST) to a view to the scope's entry in NETWORK_WRITE_LIMITS.
+        Apply below login_required, so the user is known. Works on both sync and async views.
+        A sync view served under ASGI does not queue for a write slot, and is shed at once if none is free.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                limits = _limits(request, scope)
+                if limits is None:
+                    return await view(request, *args, **kwargs)
+                refused = await run_sync(_refusal, request, scope, limits)
+                if refused is not None:
+                    return refused
+                if not await _enter_async(limits.get('queue', 1.0)):
+                    return _shed()
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    writers().release()
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limits = _limits(request, scope)
+            if limits is None:
+                return view(request, *args, **kwargs)
+            refused = _refusal(request, scope, limits)
+            if refused is not None:
+                return refused
+            # Under ASGI, Django runs every sync view on one shared thread, which waiting here would hold up.
+            queue = 0 if isinstance(request, ASGIRequest) else limits.get('queue', 1.0)
+            if not writers().acquire(timeout=queue):
+                return _shed()
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                writers().release()
+        return wrapper
+    return decorator
+
+
+def _limits(request, scope):
+    # The scope's limits, or None if the request is not limited.
+    if request.method in SAFE_METHODS:
+        return None
+    return getattr(settings, 'NETWORK_WRITE_LIMITS', {}).get(scope)
+
+
+def _refusal(request, scope, limits):
+    # Returns a 429 response if the user's or the client IP's bucket is empty, otherwise takes from both.
+    rate, burst = limits['rate'], limits['burst']
+    factor = getattr(settings, 'NETWORK_WRITE_LIMIT_IP_FACTOR', 10)
+    buckets = [(f'network:bucket:{scope}:ip:{request.META.get("REMOTE_ADDR", "")}', rate * factor, burst * factor)]
+    if request.user.is_authenticated:
+        buckets.append((f'network:bucket:{scope}:user:{request.user.id}', rate, burst))
+    wait = take_tokens(buckets)
+    if not wait:
+        return None
+    response = HttpResponse('Too many requests, please slow down.', status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+async def _enter_async(wait):
+    # Waits for a write slot without blocking the event loop, for up to wait seconds.
+    deadline = time.monotonic() + wait
+    while not writers().acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def _shed():
+    response = HttpResponse('The server is busy, please try again.', status=503)
+    response['Retry-After'] = '1'
+    return response
@@ -0,0 +1,79 @@
+""" Fan-out-on-write Following timelines.
+    When an author posts, the post is written into the timeline of every follower,
+    so that reading the Following feed is a single indexed range read per user.
+    Timelines are trimmed back to NETWORK_TIMELINE_LENGTH by `manage.py prune_timelines`, not as posts arrive,
+    as finding the timelines that are full would take a count of every follower's timeline on every post.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Post, Follower, TimelineEntry
+
+
+def timeline_length():
+    # The maximum number of entries kept in each user's timeline.
+    return getattr(settings, 'NETWORK_TIMELINE_LENGTH', 500)
+
+
+def fan_out_post(post):
+    # Adds a new post to the timelines of everyone following its author.
+    owner_ids = list(Follower.objects.filter(following=post.author_id).values_list('follower_id', flat=True))
+    entries = [TimelineEntry(owner_id=owner_id, post=post, created=post.created) for owner_id in owner_ids]
+    TimelineEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+def add_follow(user, author):
+    # Backfills the user's timeline with the author's most recent posts.
+    posts = Post.objects.filter(author=author).order_by('-created', '-id').values_list('id', 'created')
+    entries = [
+        TimelineEntry(owner=user, post_id=post_id, created=created)
+        for post_id, created in posts[:timeline_length()]
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+    prune_timelines([user.id])
+
+
+def remove_follow(user, author):
+    # Removes the author's posts from the user's timeline.
+    TimelineEntry.objects.filter(owner=user, post__author=author).delete()
+
+
+def prune_timelines(owner_ids=None):
+    """ Trims timelines that have grown past the configured length, returning the number of entries removed.
+        Checks the given owners' timelines, or everyone's. A little slack is allowed before trimming,
+        so that a full timeline is not trimmed again on every run.
+    """
+    length = timeline_length()
+    limit = length + max(length // 10, 1)
+    # One grouped count finds the timelines that need trimming.
+    full = TimelineEntry.objects.all()
+    if owner_ids is not None:
+        full = full.filter(owner__in=list(owner_ids))
+    full = full.values('owner').annotate(entries=Count('id')).filter(entries__gt=limit).values_list('owner', flat=True)
+    removed = 0
+    for owner_id in list(full):
+        cutoff = (
+            TimelineEntry.objects.filter(owner=owner_id)
+            .order_by('-created', '-post')
+            .values_list('id', flat=True)[length:]
+        )
+        removed += TimelineEntry.objects.filter(id__in=list(cutoff)).delete()[0]
+    return removed
+
+
+def rebuild_timeline(user):
+    """ Recomputes a user's timeline from the Follower and Post tables, returning the number of entries.
+        The entries are copied with a single INSERT ... SELECT, so no Python objects are built per entry.
+    """
+    authors = Follower.objects.filter(follower=user).values('following_id')
+    posts = Post.objects.filter(author__in=authors).order_by('-created', '-id').values('id', 'created')
+    sql, params = posts[:timeline_length()].query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.filter(owner=user).delete()
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} (owner_id, post_id, created) '
+            f'SELECT %s, id, created FROM ({sql})',
+            [user.id, *params],
+        )
+        return cursor.rowcount
@@ -0,0 +1,115 @@
+""" Trending posts, ranked by their likes with exponential time decay.
+    Each like adds a weight of 2 ** ((t - EPOCH) / half life) to its post, where t is when it arrived.
+    Dividing every post's sum by 2 ** ((now - EPOCH) / half life) would halve the weight of a like
+    every NETWORK_TRENDING_HALF_LIFE hours; as that divisor is the same for every post, the order of the
+    undivided sums already is the trending order, at any moment. So a like updates its post's score once,
+    as it arrives, and the feed is read in order from the post_trending_idx index.
+    The sums are kept as base 2 logarithms in Post.trending_score, so they never overflow.
+    Posts that have no likes have no score, and are left out of the feed.
+"""
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone as django_timezone
+
+from .models import Feedback, Post
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def half_life():
+    # The half life of a like's weight, in hours.
+    return getattr(settings, 'NETWORK_TRENDING_HALF_LIFE', 6)
+
+
+def like_weight(moment):
+    # The base 2 logarithm of the weight of one like made at the moment.
+    return (moment - EPOCH).total_seconds() / (half_life() * 3600)
+
+
+def score_update(delta, moment=None):
+    """ An expression for Post.trending_score with delta likes added at the moment, or removed if delta is negative.
+        Removing likes takes back the weight they added, so pass the moment they were made (Feedback.liked_at).
+        It is applied in the same UPDATE as the like count, so concurrent likes cannot lose each other's changes.
+    """
+    weight = like_weight(moment or django_timezone.now()) + math.log2(abs(delta))
+    if delta > 0:
+        return net_score_update(weight, None, delta)
+    return net_score_update(None, weight, delta)
+
+
+def net_score_update(added, removed, delta):
+    """ An expression for Post.trending_score with the weights of some likes added and of others removed,
+        each the base 2 logarithm of a sum of like weights (see combine_weights), or None if there are none.
+        delta is the change in the post's like count.
+    """
+    score = F('trending_score')
+    if added is not None and removed is not None:
+        if abs(added - removed) < 1e-9:
+            return score
+        if added > removed:
+            added, removed = _subtract_weight(added, removed), None
+        else:
+            added, removed = None, _subtract_weight(removed, added)
+    if removed is None:
+        weight = Value(added)
+        # log2(2 ** score + 2 ** weight), computed without leaving logarithms.
+        return Case(
+            When(trending_score__isnull=True, then=weight),
+            default=Greatest(score, weight) + Log(2, Value(1.0) + Power(2, -Abs(score - weight))),
+            output_field=FloatField(),
+        )
+    weight = Value(removed)
+    # log2(2 ** score - 2 ** weight). Once the likes removed outweigh the score, the post stops trending.
+    return Case(
+        When(trending_score__gt=removed + 1e-6, then=score + Log(2, Value(1.0) - Power(2, weight - score))),
+        # Unless it still has likes, whose weight rounding or undated likes left out of the score.
+        When(like_count__gt=max(-delta, 0), then=score),
+        default=Value(None),
+        output_field=FloatField(),
+    )
+
+
+def combine_weights(first, second):
+    # The base 2 logarithm of the sum of two weights given as base 2 logarithms, either of which may be None.
+    if first is None or second is None:
+        return second if first is None else first
+    return max(first, second) + math.log2(1 + 2 ** -abs(first - second))
+
+
+def _subtract_weight(larger, smaller):
+    return larger + math.log2(1 - 2 ** (smaller - larger))
+
+
+def rebuild_scores(batch_size=1000):
+    """ Resets every post's score from the likes recorded in Feedback, e.g. after changing the half life.
+        Returns the number of posts with a score.
+    """
+    likes = (
+        Feedback.objects.filter(opinion=Feedback.LIKE).order_by('post_id')
+        .values_list('post_id', 'liked_at', 'post__created')
+    )
+    scored = 0
+    batch = []
+    post_id, score = None, None
+    with transaction.atomic():
+        Post.objects.filter(trending_score__isnull=False).update(trending_score=None)
+        for liked_id, liked_at, created in likes.iterator(chunk_size=batch_size):
+            if liked_id != post_id:
+                if post_id is not None:
+                    batch.append(Post(id=post_id, trending_score=score))
+                post_id, score = liked_id, None
+            # Likes made before Feedback.liked_at was recorded are counted as if made when their post was.
+            score = combine_weights(score, like_weight(liked_at or created))
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, ['trending_score'])
+                scored += len(batch)
+                batch = []
+        if post_id is not None:
+            batch.append(Post(id=post_id, trending_score=score))
+        Post.objects.bulk_update(batch, ['trending_score'])
+    return scored + len(batch)
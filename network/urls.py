@@ -1,16 +1,27 @@
 
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Under ASGI the timeline and like views are served by their async versions, see project4/asgi.py.
+timeline_views = async_views if getattr(settings, 'NETWORK_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
-    path("posts", views.get_posts, name="posts"),
-    path("following", views.get_following, name="following"),
-    path("like", views.like, name="like"),
+    path("posts", timeline_views.get_posts, name="posts"),
+    path("following", timeline_views.get_following, name="following"),
+    path("trending", views.get_trending, name="trending"),
+    path("search", views.search, name="search"),
+    path("like", timeline_views.like, name="like"),
     path("follow", views.follow, name="follow"),
     path("update", views.update, name="update"),
+    path("api/posts", views.api_posts, name="api_posts"),
+    path("api/following", views.api_following, name="api_following"),
+    path("api/trending", views.api_trending, name="api_trending"),
+    path("api/search", views.api_search, name="api_search"),
+    path("api/post_text", views.post_text, name="post_text"),
 ]
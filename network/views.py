@@ -1,40 +1,56 @@
+import hashlib
 import json
+import time
 from datetime import datetime
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
 from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
 from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-from .models import User, Post, Follower, Feedback
+from .models import User, Post, Follower, Feedback, TimelineEntry
+from .auth import forget_users
+from .buffer import like_buffer
+from .pagination import paginate_by_cursor
+from .recommendations import who_to_follow
+from .search import search_posts
+from .throttle import rate_limited
+from . import events, timeline, trending
+
+LANDING_CACHE_KEY = 'network:landing'
 
 
 def index(request):
-    # determine if the user is 'AnonymousUser', or a registered user
-    view_intro = False
-    try:
-        # If a registered user, redirect to the posts view.
-        if User.objects.get(id=request.user.id):
-            return HttpResponseRedirect(reverse("posts"))
-    except User.DoesNotExist:
-        # If the user is not registered, then we will display some intro blurb
-        view_intro = True
-    # Also limit posts for Index page, purely a taster for unregistered users.
-    posts = Post.objects.all().order_by('-id')[:3]
-    # And finally, Grey out the like icons
-    opinion = 'U'
-    post_list = []
-    for post in posts:
-        post_list.append((post, opinion))
-    content = {
-        'intro': view_intro,
-        'post_list': post_list,
-    }
-    return render(request, "network/index.html", content)
+    # If a registered user, redirect to the posts view.
+    if request.user.is_authenticated:
+        return HttpResponseRedirect(reverse("posts"))
+
+    # Otherwise serve the landing page, which is the same for every unregistered user, so is cached.
+    landing = cache.get(LANDING_CACHE_KEY)
+    if landing is None:
+        landing = _render_landing_page(request)
+        cache.set(LANDING_CACHE_KEY, landing, getattr(settings, 'NETWORK_LANDING_TIMEOUT', 60))
+
+    # Browsers and proxies that already hold this version of the page get a 304 Not Modified.
+    response = get_conditional_response(
+        request, etag=landing['etag'], last_modified=landing['last_modified'],
+    )
+    if response is None:
+        response = HttpResponse(landing['content'])
+    response['ETag'] = landing['etag']
+    response['Last-Modified'] = http_date(landing['last_modified'])
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
 
 
 def login_view(request):
@@ -91,6 +107,7 @@ def register(request):
 
 
 @login_required(login_url='/login')
+@rate_limited('post')
 def get_posts(request):
     """ Returns a list of Posts, either 'all posts' or the posts relating to a supplied userid (uid)
         Also detects if an author submits a new Post, and if so, processes that.
@@ -98,47 +115,40 @@ def get_posts(request):
 
     # Evaluate whether the user has submitted a new Post and if so, save it before returning the list of Posts
     if request.method == 'POST':
-        post = Post(
-            author=request.user,
-            text=request.POST.get('text', ''),
-            created=datetime.now()
-        )
-        post.save()
+        _create_post(request.user, request.POST.get('text', ''))
 
     follower_count = None
     following_count = None
     person = None
     follow_option = None
+    suggestions = None
 
     # There may be a userid (uid) parameter passed with the GET, so look for it.
     user_id = request.GET.get('uid', '')
     # If there is one, then limit the posts to that userid.
     if user_id:
-        person = User.objects.get(id=user_id)
-        posts = Post.objects.filter(author=user_id).order_by('-created')
+        # The user's own profile needs no query, as they are already loaded.
+        person = request.user if user_id == str(request.user.id) else User.objects.get(id=user_id)
         follower_count = _followers(person)
         following_count = _following(person)
         if person == request.user:
             follow_option = None
         else:
             follow_option = _get_follow_option(person, request.user)
+        # Alongside a profile, suggest other authors to follow.
+        suggestions = list(who_to_follow(request.user))
 
-    else:
-        # Otherwise get all posts.
-        posts = Post.objects.all().order_by('-created')
-
-    # Now annotate the posts with the like option, based on the user.
-    annotated_post_list = _annotate_post_opinions(posts, request.user)
-
-    # Now call the Django pagination facility helper function to figure out which posts to show.
-    post_list = _paginate(request, annotated_post_list)
+    # Get a page of that user's posts, or otherwise of all posts.
+    post_list = _posts_page(request, user_id)
 
     content = {
         'person': person,
         'post_list': post_list,
         'followers': follower_count,
         'following': following_count,
-        'follow_option': follow_option
+        'follow_option': follow_option,
+        'suggestions': suggestions,
+        'live': _live_feed(user_id or 'all'),
     }
     return render(request, "network/index.html", content)
 
@@ -147,13 +157,7 @@ def get_posts(request):
 def get_following(request):
     """ Returns the posts for all of the authors that the user is following.
     """
-    user_id = request.user.id
-    authors = Follower.objects.filter(follower=user_id)
-    posts = Post.objects.filter(author__in=authors.values_list('following_id', flat=True)).order_by('-created')
-    annotated_post_list = _annotate_post_opinions(posts, request.user)
-
-    # Now call the Django pagination facility helper function to figure out which posts to show.
-    post_list = _paginate(request, annotated_post_list)
+    post_list = _following_page(request)
 
     follower_count = _followers(request.user)
     following_count = _following(request.user)
@@ -161,66 +165,98 @@ def get_following(request):
     content = {
         'post_list': post_list,
         'followers': follower_count,
-        'following': following_count
+        'following': following_count,
+        'live': _live_feed('following'),
+    }
+    return render(request, "network/index.html", content)
+
+
+@login_required(login_url='/login')
+def get_trending(request):
+    """ Returns the posts with the most likes recently, as scored in network/trending.py.
+    """
+    content = {
+        'post_list': _trending_page(request),
+        'trending': True,
+        'live': _live_feed('trending'),
+    }
+    return render(request, "network/index.html", content)
+
+
+@login_required(login_url='/login')
+def api_posts(request):
+    """ Returns a page of Posts as JSON, either 'all posts' or the posts relating to a supplied userid (uid).
+        Pass the 'next' cursor of a response back as ?cursor= to fetch the following page.
+    """
+    user_id = request.GET.get('uid', '')
+    if user_id and not user_id.isdigit():
+        return HttpResponse(status=404)
+    return _timeline_json(_posts_page(request, user_id, cursor=True))
+
+
+@login_required(login_url='/login')
+def api_following(request):
+    """ Returns a page of the posts for all of the authors that the user is following, as JSON.
+    """
+    return _timeline_json(_following_page(request, cursor=True))
+
+
+@login_required(login_url='/login')
+def search(request):
+    """ Returns the posts containing every word of the search query (q), best match first.
+    """
+    query = request.GET.get('q', '')
+    content = {
+        'post_list': _search_page(request, query),
+        'search': query,
+        'live': _live_feed('search'),
     }
     return render(request, "network/index.html", content)
 
 
 @login_required(login_url='/login')
+def api_trending(request):
+    """ Returns a page of the trending posts as JSON, most liked recently first.
+    """
+    return _timeline_json(_trending_page(request, cursor=True))
+
+
+@login_required(login_url='/login')
+def api_search(request):
+    """ Returns a page of the posts matching the search query (q) as JSON, best match first.
+    """
+    return _timeline_json(_search_page(request, request.GET.get('q', '')))
+
+
+def post_text(request):
+    """ Returns the full text of a post (id) as JSON, for expanding a card whose excerpt leaves some out.
+        Public, as the landing page shows excerpts to visitors who are not logged in.
+    """
+    post_id = request.GET.get('id', '')
+    post = Post.objects.filter(id=post_id).values('id', 'text').first() if post_id.isdigit() else None
+    if post is None:
+        return HttpResponse(status=404)
+    return JsonResponse({'post_id': post['id'], 'text': post['text']})
+
+
+@login_required(login_url='/login')
+@rate_limited('like')
 def like(request):
     """ Evaluate a Like/Unlike request from a User, for a specified post.
         Checks that the user is not liking their own posts.
-        Toggles the like status for the Post.
-        Updates the like count for the Post.
+        Toggles the like status for the Post, and updates the like count for the Post,
+        together in a single transaction so that concurrent clicks cannot leave them out of step.
         Provides a JSON response that can be consumed by the client e.g. as part of a Fetch()
     """
-    user = request.user
-    post_id = request.GET.get('id', '')
-    post = Post.objects.get(id=post_id)
-    if post.author != user:
-        try:
-            # Check to see if there is a record of the user previously liking the post.
-            # If there is, update that record, and update the Like count as appropriate.
-            feedback = Feedback.objects.get(post=post.id, reader=user)
-            if feedback.opinion == 'L':
-                feedback.opinion = 'U'
-                # Use a Django F() expression to perform an operation directly on the database.
-                post.like_count = F('like_count') - 1
-            else:
-                feedback.opinion = 'L'
-                # Use a Django F() expression to perform an operation directly on the database.
-                post.like_count = F('like_count') + 1
-            feedback.save()
-            post.save()
-        # If there is no previous record, create a new one and update the like count as appropriate.
-        except Feedback.DoesNotExist:
-            # Add the like to the post
-            feedback = Feedback(post=post, reader=user, opinion='L')
-            feedback.save()
-            # Use a Django F() expression to perform an operation directly on the database.
-            post.like_count = F('like_count') + 1
-            post.save()
-        opinion = feedback.opinion
-    else:
-        # If User attempts to Like their own post, returns the 'Unliked' opinion
-        opinion = 'U'
-    # Now ensure that we have the post 'as stored', by refreshing from the database.
-    post.refresh_from_db()
+    if request.method != 'POST':
+        # Method is not POST, therefore is not an Authorized method.
+        return HttpResponse(status=403)
 
-    follower_count = _followers(post.author)
-    following_count = _following(user)
-
-    content = {
-        'post_id': post.id,
-        'opinion': opinion,
-        'followers': follower_count,
-        'following': following_count,
-        'likes': post.like_count,
-    }
-    return JsonResponse(content)
+    return _like_post(request.user, request.GET.get('id', ''))
 
 
 @login_required(login_url='/login')
+@rate_limited('follow')
 def follow(request):
     """ Enables a User to 'Follow' an author,
         thereby making it easy for the user to see the latest posts from
@@ -244,14 +280,25 @@ def follow(request):
                 follower=user,
                 following=author,
             )
-            follower.save()
-        else:
-            # If the follow option is to 'Unfollow' then attempt to delete the Follower record.
             try:
-                Follower.objects.get(following=author, follower=user).delete()
-            except Follower.DoesNotExist:
-                # In the unlikely scenario of No follower match found, then nothing to delete.
+                with transaction.atomic():
+                    follower.save()
+                    _adjust_follow_counts(user, author, 1)
+                    # Bring the author's recent posts into the user's Following timeline.
+                    timeline.add_follow(user, author)
+            except IntegrityError:
+                # A concurrent request has already added the Follower record, which is unique per pair.
                 pass
+        else:
+            # If the follow option is to 'Unfollow' then attempt to delete the Follower record.
+            # The delete is the first statement of the transaction, so on SQLite it waits for the write lock
+            # rather than failing when another request is writing.
+            with transaction.atomic():
+                deleted, _ = Follower.objects.filter(following=author, follower=user).delete()
+                # In the unlikely scenario of No follower match found, then nothing was deleted.
+                if deleted:
+                    _adjust_follow_counts(user, author, -1)
+                    timeline.remove_follow(user, author)
     else:
         # If the user = author, then do nothing regarding Following.
         pass
@@ -262,6 +309,7 @@ def follow(request):
 
 
 @login_required(login_url='/login')
+@rate_limited('update')
 def update(request):
     """ Updates a post if the user is the author.
     """
@@ -272,8 +320,12 @@ def update(request):
         try:
             post = Post.objects.get(id=post_id)
             if post.author == user:
+                _invalidate_post_cards(post.id, post.updated)
                 post.text = body['text']
-                post.save()
+                # Only write the edited columns, so likes counted since the post was read are kept.
+                post.save(update_fields=['text', 'excerpt', 'truncated', 'updated'])
+                _invalidate_landing_page()
+                events.publish_update(post.id, post.excerpt, post.truncated)
                 # User is the Author and Post exists.
                 return HttpResponse(status=200)
             else:
@@ -289,30 +341,229 @@ def update(request):
 
 # Internal Helper functions
 def _followers(author):
-    # Returns the number of Followers for a given Author.
-    follower_count = Follower.objects.filter(following=author).count()
-    return follower_count
+    # Returns the number of Followers for a given Author, as kept on the User record.
+    return author.follower_count
 
 
 def _following(user):
-    # Returns the number of Authors that the given user is following.
-    following_count = Follower.objects.filter(follower=user).count()
-    return following_count
+    # Returns the number of Authors that the given user is following, as kept on the User record.
+    return user.following_count
+
+
+def _adjust_follow_counts(user, author, delta):
+    # Use Django F() expressions so that concurrent follows update the counters directly on the database.
+    # Call this in the same transaction as the Follower create or delete.
+    # The user's follows changed, so their recommendations are recomputed on the next refresh.
+    User.objects.filter(id=user.id).update(following_count=F('following_count') + delta, recommendations_stale=True)
+    User.objects.filter(id=author.id).update(follower_count=F('follower_count') + delta)
+    # Both users' cached copies now show the old counts.
+    forget_users(user.id, author.id)
+
+
+def _create_post(user, text):
+    # Saves a new post by the user, and writes it into the Following timelines of the user's followers.
+    post = Post(
+        author=user,
+        text=text,
+        created=datetime.now()
+    )
+    post.save()
+    timeline.fan_out_post(post)
+    _invalidate_landing_page()
+    events.publish_post(post)
+    return post
+
+
+def _like_post(user, post_id):
+    # Toggles the user's opinion of a post, and returns the new opinion and like count as JSON.
+    # The author of a post never changes, so it is read before the transaction starts.
+    # On SQLite this keeps the transaction write-first, so concurrent likes queue for the lock rather than failing.
+    post = Post.objects.filter(id=post_id).values_list('author_id', 'like_count', 'updated', 'created').first() \
+        if post_id.isdigit() else None
+    if post is None:
+        # Post is not found.
+        return HttpResponse(status=404)
+    author_id, like_count, updated, created = post
+
+    if author_id != user.id:
+        with transaction.atomic():
+            opinion, liked_at = _toggle_feedback(post_id, user)
+            delta = 1 if opinion == Feedback.LIKE else -1
+            # An unlike takes back the weight its like added; likes without a time count as made with the post.
+            moment = liked_at or created
+            if not like_buffer.enabled():
+                # Use a Django F() expression to perform an operation directly on the database.
+                # The trending score takes the like in the same update.
+                Post.objects.filter(id=post_id).update(
+                    like_count=F('like_count') + delta, trending_score=trending.score_update(delta, moment),
+                )
+                like_count = Post.objects.filter(id=post_id).values_list('like_count', flat=True).get()
+        if like_buffer.enabled():
+            # The like count is written behind, in batches, so leave the Post row alone.
+            like_buffer.add(int(post_id), delta, moment)
+        # The cached cards for this post show the old like count.
+        _invalidate_post_cards(post_id, updated)
+    else:
+        # If User attempts to Like their own post, returns the 'Unliked' opinion
+        opinion = Feedback.UNLIKE
+    if like_buffer.enabled():
+        # Read again, as a flush since the read above may have moved buffered likes into the row.
+        like_count = like_buffer.like_count(int(post_id))
+    if author_id != user.id:
+        # Update the count on other open pages showing the post.
+        events.publish_like(int(post_id), like_count)
+
+    content = {
+        'post_id': int(post_id),
+        'opinion': opinion,
+        'likes': like_count,
+    }
+    return JsonResponse(content)
+
+
+def _live_feed(feed):
+    # Names the feed that the page's live updates follow, see network/events.py; only offered under ASGI.
+    return feed if getattr(settings, 'NETWORK_EVENTS', False) else None
+
+
+def _toggle_feedback(post_id, user):
+    # Flips the user's opinion of a post and returns the new opinion, and when the like it adds or removes was made.
+    # If there is no previous record, a 'Like' is created.
+    now = timezone.now()
+    toggled = Feedback.objects.filter(post=post_id, reader=user).update(
+        opinion=Case(When(opinion=Feedback.LIKE, then=Value(Feedback.UNLIKE)), default=Value(Feedback.LIKE)),
+        liked_at=Case(When(opinion=Feedback.LIKE, then=F('liked_at')), default=Value(now)),
+    )
+    if toggled:
+        return Feedback.objects.filter(post=post_id, reader=user).values_list('opinion', 'liked_at').get()
+    try:
+        with transaction.atomic():
+            Feedback.objects.create(post_id=post_id, reader=user, opinion=Feedback.LIKE, liked_at=now)
+        return Feedback.LIKE, now
+    except IntegrityError:
+        # A concurrent request created the record first, so toggle that one instead.
+        return _toggle_feedback(post_id, user)
+
+
+def _render_landing_page(request):
+    # Renders the landing page for unregistered users, and the validators that browsers can revalidate it with.
+    # Limit posts for Index page, purely a taster for unregistered users.
+    posts = list(Post.objects.select_related('author').defer('text').order_by('-id')[:3])
+    like_buffer.merge(posts)
+    # And finally, Grey out the like icons
+    opinion = 'U'
+    post_list = []
+    for post in posts:
+        post_list.append((post, opinion))
+    content = {
+        'intro': True,
+        'post_list': post_list,
+    }
+    html = render(request, "network/index.html", content).content
+    return {
+        'content': html,
+        'etag': quote_etag(hashlib.md5(html).hexdigest()),
+        'last_modified': int(time.time()),
+    }
+
+
+def _invalidate_landing_page():
+    # Drops the cached landing page, so that it is rendered afresh with the latest posts.
+    cache.delete(LANDING_CACHE_KEY)
+
+
+def _invalidate_post_cards(post_id, updated):
+    # Removes every cached rendering of a post card (see the post_card fragment in index.html).
+    keys = [
+        make_template_fragment_key('post_card', [post_id, updated.isoformat(), state])
+        for state in ('own', Feedback.LIKE, Feedback.UNLIKE)
+    ]
+    caches['template_fragments'].delete_many(keys)
 
 
 def _annotate_post_opinions(posts, user):
-    # Annotate posts with Like/Unlike options
+    # Annotate posts with Like/Unlike options.
+    # The liked post IDs for the whole batch are fetched in a single query,
+    # so pass in a page of posts rather than the full queryset.
+    posts = list(posts)
+    # Include any like counts that are still waiting in the write-behind buffer.
+    like_buffer.merge(posts)
+    liked_ids = set(
+        Feedback.objects.filter(
+            reader=user,
+            opinion=Feedback.LIKE,
+            post__in=[post.id for post in posts],
+        ).values_list('post_id', flat=True)
+    )
     post_list = []
     for post in posts:
-        try:
-            post_liked = Feedback.objects.get(post=post.id, reader=user, opinion='L')
-            opinion = post_liked.opinion
-        except Feedback.DoesNotExist:
-            opinion = 'U'
+        opinion = Feedback.LIKE if post.id in liked_ids else Feedback.UNLIKE
         post_list.append((post, opinion))
     return post_list
 
 
+def _posts_page(request, user_id=None, cursor=False):
+    # Returns a page of (post, opinion) pairs, for all posts or the posts of one author.
+    # Shared by the HTML and JSON views. Cards show the excerpt, so the full text is never loaded.
+    posts = Post.objects.defer('text')
+    if user_id:
+        posts = posts.filter(author=user_id)
+    # Now call the Django pagination facility helper function to figure out which posts to show,
+    # and then annotate just that page with the like option, based on the user.
+    post_list = _paginate(request, posts.order_by('-created', '-id').select_related('author'), cursor=cursor)
+    post_list.object_list = _annotate_post_opinions(post_list.object_list, request.user)
+    return post_list
+
+
+def _following_page(request, cursor=False):
+    # Returns a page of (post, opinion) pairs from the user's Following timeline.
+    # The timeline is precomputed when posts are written, so it is read in order from its index.
+    entries = TimelineEntry.objects.filter(owner=request.user).order_by('-created', '-post')
+    entries = entries.select_related('post__author').defer('post__text')
+    post_list = _paginate(request, entries, key=('created', 'post_id'), cursor=cursor)
+    posts = [entry.post for entry in post_list.object_list]
+    post_list.object_list = _annotate_post_opinions(posts, request.user)
+    return post_list
+
+
+def _trending_page(request, cursor=False):
+    # Returns a page of (post, opinion) pairs in trending order, read from the score index.
+    posts = Post.objects.filter(trending_score__isnull=False).defer('text').order_by('-trending_score', '-id')
+    post_list = _paginate(request, posts.select_related('author'), key=('trending_score', 'id'), cursor=cursor)
+    post_list.object_list = _annotate_post_opinions(post_list.object_list, request.user)
+    return post_list
+
+
+def _search_page(request, query):
+    # Returns a page of (post, opinion) pairs matching the search query, in rank order.
+    post_list = search_posts(query, request.GET.get('cursor', ''))
+    post_list.object_list = _annotate_post_opinions(post_list.object_list, request.user)
+    return post_list
+
+
+def _timeline_json(post_list):
+    # A compact JSON rendering of a cursor page of (post, opinion) pairs.
+    posts = [
+        {
+            'id': post.id,
+            'author': post.author.username,
+            'author_id': post.author_id,
+            'excerpt': post.excerpt,
+            'truncated': post.truncated,
+            'created': post.created.isoformat(),
+            'likes': post.like_count,
+            'opinion': opinion,
+        }
+        for post, opinion in post_list
+    ]
+    content = {
+        'posts': posts,
+        'next': post_list.next_cursor,
+        'prev': post_list.prev_cursor,
+    }
+    return JsonResponse(content, json_dumps_params={'separators': (',', ':')})
+
+
 def _get_follow_option(person, user):
     # Advises whether an Author can be Followed, or Unfollowed
     # as determined by the the existence, or not of a Follower record.
@@ -324,10 +575,19 @@ def _get_follow_option(person, user):
     return follow_option
 
 
-def _paginate(request, annotated_post_list):
-    # The Django paginate feature.
+def _paginate(request, posts, key=('created', 'id'), cursor=False):
+    # Keyset pagination if asked for or configured, or if the request carries a cursor.
+    if cursor or getattr(settings, 'NETWORK_PAGINATION', 'page') == 'cursor' or 'cursor' in request.GET:
+        return paginate_by_cursor(
+            posts,
+            request.GET.get('cursor', ''),
+            per_page=10,
+            with_count=getattr(settings, 'NETWORK_PAGINATION_COUNT', False),
+            key=key,
+        )
+    # Otherwise the Django paginate feature.
     page = request.GET.get('page', 1)
-    paginator = Paginator(annotated_post_list, 10)  # 10 Posts per page
+    paginator = Paginator(posts, 10)  # 10 Posts per page
     try:
         post_list = paginator.page(page)
     except PageNotAnInteger:
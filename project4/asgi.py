@@ -12,5 +12,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
+# Serve the async versions of the timeline and like views.
+os.environ.setdefault('NETWORK_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# The live update stream is served outside Django, which cannot stream a response asynchronously.
+from network.events import sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/events':
+        await sse_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
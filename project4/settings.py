@@ -38,15 +38,20 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     # My apps
-    'network',
+    'network.apps.NetworkConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files, precompressed and cached by hashed name, see network/storage.py.
+    'network.middleware.StaticFilesMiddleware',
+    # Measures everything below it, including the session and user lookups.
+    'network.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'network.middleware.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,11 +84,121 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Keep connections open between requests, rather than paying for a new one every time.
+        'CONN_MAX_AGE': 60,
+        # Tests use a database file rather than shared memory, so that concurrent requests see real SQLite locking.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    },
+    # Timeline and profile reads go to the replica, see network/routers.py.
+    # Locally this is a second connection to the same file, which is always in step;
+    # in production point it at a read replica of the primary.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['network.routers.ReplicaRouter']
+
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Rendered post cards are kept in 'template_fragments'. Any backend that can be shared by the
+# server processes will do, e.g. 'django.core.cache.backends.filebased.FileBasedCache'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+    },
+}
+
+# Sessions are read from the default cache, and written through to the database.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Logged in users are identified from the default cache too, for NETWORK_USER_CACHE_TIMEOUT seconds at a time.
+AUTHENTICATION_BACKENDS = ['network.auth.CachedModelBackend']
+NETWORK_USER_CACHE_TIMEOUT = 300
+
+# Admin changelists estimate the size of whole tables, and count filtered or searched lists up to this many rows.
+NETWORK_ADMIN_COUNT_LIMIT = 10000
+
+# The database alias that timeline and profile reads are routed to, or None to read from the primary.
+# After a user writes, their reads stay on the primary for NETWORK_REPLICA_STICKY_SECONDS. The marker is kept
+# in the default cache, which must be shared between server processes for this to hold across them.
+NETWORK_REPLICA_DATABASE = 'replica'
+NETWORK_REPLICA_STICKY_SECONDS = 5
+
+# Applied to every new SQLite connection, see network/signals.py.
+# WAL lets readers carry on while a write is in progress, busy_timeout (ms) makes writers wait for the lock,
+# and mmap_size (bytes) and cache_size (negative is KiB) keep more of the database in memory.
+NETWORK_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
 }
 
 AUTH_USER_MODEL = "network.User"
 
+# Network timelines
+# 'cursor' pages through posts by (created, id), 'page' uses numbered pages via the Django Paginator.
+NETWORK_PAGINATION = 'cursor'
+# Whether cursor pages also report the total number of posts, which needs a COUNT(*) query.
+NETWORK_PAGINATION_COUNT = False
+# The number of posts kept in each user's precomputed Following timeline by `manage.py prune_timelines`.
+NETWORK_TIMELINE_LENGTH = 500
+# Whether like counts are buffered in process and written to the database in batches.
+# The buffer is flushed every NETWORK_LIKE_BUFFER_INTERVAL seconds, or once NETWORK_LIKE_BUFFER_SIZE posts are waiting.
+NETWORK_LIKE_BUFFER = False
+NETWORK_LIKE_BUFFER_INTERVAL = 1.0
+NETWORK_LIKE_BUFFER_SIZE = 100
+# How many hours it takes for a like's weight in the trending feed to halve.
+# Changing it needs `manage.py rebuild_trending`, as scores already stored were weighted with the old value.
+NETWORK_TRENDING_HALF_LIFE = 6
+# How many 'Who to follow' suggestions are precomputed for each user by `manage.py refresh_recommendations`,
+# and how much each post liked by both the user and a candidate adds to the candidate's score,
+# on top of one for each followed author who follows the candidate. 0 scores by follows alone.
+NETWORK_RECOMMENDATIONS = 10
+NETWORK_RECOMMEND_COLIKE_WEIGHT = 0.0
+# How many seconds the landing page for unregistered users is cached for, between new posts.
+NETWORK_LANDING_TIMEOUT = 60
+# The fraction of requests that the performance middleware measures,
+# and how many times a query must repeat within a request to be reported as an N+1 pattern.
+# At 0, nothing is measured and the template backend is left unwrapped.
+NETWORK_PERF_SAMPLE_RATE = 1.0
+NETWORK_PERF_REPEAT_THRESHOLD = 3
+# Whether the timeline and like views are served by their async versions, which project4/asgi.py turns on.
+# Their database work runs on a pool of NETWORK_ASYNC_DB_THREADS threads.
+NETWORK_ASYNC_VIEWS = os.environ.get('NETWORK_ASYNC_VIEWS', '') == '1'
+NETWORK_ASYNC_DB_THREADS = 8
+# Token buckets for the write views, see network/throttle.py: each user may make `rate` writes a second,
+# in bursts of up to `burst`, and each client IP NETWORK_WRITE_LIMIT_IP_FACTOR times that. Admitted writes wait
+# up to `queue` seconds for one of the NETWORK_WRITERS write slots of the process. Views left out are not limited.
+# Buckets are updated atomically within a process, but not between processes sharing the cache, so concurrent
+# writes from several processes may together overrun a bucket by a few tokens.
+NETWORK_WRITE_LIMITS = {
+    'post': {'rate': 0.2, 'burst': 10, 'queue': 2.0},
+    'like': {'rate': 2.0, 'burst': 30, 'queue': 0.5},
+    'follow': {'rate': 0.5, 'burst': 30, 'queue': 1.0},
+    'update': {'rate': 0.5, 'burst': 20, 'queue': 2.0},
+}
+NETWORK_WRITE_LIMIT_IP_FACTOR = 10
+NETWORK_WRITERS = 4
+# Whether pages open the live update stream, GET /events, which project4/asgi.py serves.
+# Idle streams are sent a keepalive comment every NETWORK_EVENTS_KEEPALIVE seconds.
+NETWORK_EVENTS = NETWORK_ASYNC_VIEWS
+NETWORK_EVENTS_KEEPALIVE = 20
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -103,6 +218,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logging
+# https://docs.djangoproject.com/en/3.0/topics/logging/
+# The performance middleware writes a JSON line per measured request to 'network.performance'.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'network.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('NETWORK_PERF_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
 
@@ -121,3 +257,7 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+# `manage.py collectstatic` gathers the static files into STATIC_ROOT under content hashed names,
+# with gzip and (if the brotli package is installed) brotli copies, for StaticFilesMiddleware to serve.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'network.storage.CompressedManifestStaticFilesStorage'